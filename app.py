@@ -1,23 +1,44 @@
-import streamlit as st
-import src.pages.home
-import src.pages.data
-import src.pages.dashboard
-import src.pages.contribute
-import src.pages.about
+import importlib
+import os
+import time
+from src.pages.utils.tracing import tracer
 
+# Streamlit is the one heavy import the app itself pays for; pages import the rest lazily.
+with tracer.span("app.imports"):
+    import streamlit as st
 
+DEBUG_PANEL = os.environ.get("COVID_DEBUG_PANEL") == "1"
+METRICS_FILE = os.environ.get("COVID_METRICS_FILE")
+
+# Page modules are imported the first time they are selected, so visiting Home or About does not
+# pay for pandas, numpy and plotly.
 PAGES = {
-    "Home": src.pages.home,
-    "Data": src.pages.data,
-    "Dashboard": src.pages.dashboard,
-    "About": src.pages.about,
-    "Contribute": src.pages.contribute
+    "Home": "src.pages.home",
+    "Data": "src.pages.data",
+    "Dashboard": "src.pages.dashboard",
+    "About": "src.pages.about",
+    "Contribute": "src.pages.contribute"
 }
 
+
+def load_page(name):
+    """
+    Function imports a page module on first use.
+
+    :param name: str, key of PAGES
+    :return: module
+    """
+    with tracer.span("import.{}".format(name)):
+        return importlib.import_module(PAGES[name])
+
+
 def main():
+    start = time.perf_counter()
     st.sidebar.title("Menu")
     choice = st.sidebar.radio("Navigate", list(PAGES.keys()))
-    PAGES[choice].main()
+    page = load_page(choice)
+    with tracer.span("page.{}".format(choice)):
+        page.main()
     st.sidebar.title("About")
     st.sidebar.info(
         """
@@ -28,6 +49,12 @@ def main():
     st.sidebar.title("Contribute")
     st.sidebar.info("Feel free to contribute to this open source project. The github link can be found "
                     "[here](https://github.com/Sayar1106/covid-dashboard)")
+    if DEBUG_PANEL and st.sidebar.checkbox("Performance panel"):
+        from src.pages.utils.performance_panel import performance_panel
+        performance_panel()
+    tracer.record("app.rerun", time.perf_counter() - start)
+    if METRICS_FILE:
+        tracer.write_prometheus(METRICS_FILE)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,243 @@
+"""
+Offline benchmarks for the loaders and plot functions on synthetic JHU shaped data.
+
+    python -m benchmarks.run                          # run every scale, print results
+    python -m benchmarks.run --save benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 1.5 --size-threshold 1.1
+
+With --baseline the run fails (exit status 1) when any benchmark is slower than threshold times
+its baseline wall time, or any recorded size (frame memory, chart payload) is larger than
+size-threshold times its baseline size.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import generate
+
+SCALES = {
+    "small": dict(countries=20, provinces=4, days=60, us_counties=20),
+    "medium": dict(countries=100, provinces=8, days=300, us_counties=100),
+    "large": dict(countries=200, provinces=10, days=800, us_counties=330),
+}
+
+
+def measure(func, repeat=3, setup=None):
+    """
+    Function times a call, keeping the best wall time and the peak traced memory.
+
+    :param func: callable
+    :param repeat: int
+    :param setup: callable run before every repetition, outside the measurement
+    :return: dict with seconds and peak_mb
+    """
+    best = None
+    peak = 0
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {"seconds": round(best, 6), "peak_mb": round(peak / 2 ** 20, 3)}
+
+
+def run_scale(name, params, repeat):
+    """
+    Function generates one scale of synthetic data and benchmarks every hot path on it. The
+    synthetic source, with the store and shared store under it, is removed afterwards.
+
+    :param name: str
+    :param params: dict, arguments of benchmarks.synthetic.generate
+    :param repeat: int
+    :return: dict with timings (benchmark name -> measurement) and sizes_mb (size name -> MB)
+    """
+    source = tempfile.mkdtemp(prefix="covid-bench-{}-".format(name))
+    try:
+        report_date = generate(source, **params)[-1]
+
+        from src.pages.utils import snapshot_store
+        snapshot_store.DATA_SOURCE = source
+        snapshot_store.STORE_PATH = os.path.join(source, "store")
+        from src.pages.utils import shared_dataset
+        shared_dataset.SHARED_PATH = os.path.join(source, "shared")
+
+        from src.pages import dashboard
+        from src.pages.utils.fetch_url import fetch_url
+        from src.pages.utils.figure_cache import figure_cache
+        from src.pages.utils.load_data import VIEW_COLUMNS, country_slice, load_data
+        from src.pages.utils.load_time_series import TimeSeriesRefresher
+        from src.pages.utils import rolling_analytics, time_series_cube
+        from src.pages.utils.chart_payload import CHART_WIDTH, compact_figure
+        import plotly.graph_objects as go
+
+        def cold():
+            figure_cache.clear()
+            time_series_cube._CUBES.clear()
+
+        def clear_store():
+            cold()
+            for kind in snapshot_store.REPORT_FOLDERS:
+                path = snapshot_store.report_path(kind, report_date)
+                if os.path.exists(path):
+                    os.remove(path)
+            clear_shared_reports()
+
+        def clear_shared_reports():
+            cold()
+            shutil.rmtree(os.path.join(shared_dataset.SHARED_PATH, "reports"), ignore_errors=True)
+
+        results = {}
+        sizes = {}
+        refresher = TimeSeriesRefresher()
+        results["load_time_series"] = measure(refresher.load, repeat, setup=cold)
+        time_series = refresher.frame
+        results["load_time_series (attach)"] = measure(lambda: shared_dataset.attach("time_series"), repeat, setup=cold)
+        url = fetch_url(report_date)
+        us_url = fetch_url(report_date, country="US")
+        results["load_data (ingest)"] = measure(lambda: load_data(url), repeat, setup=clear_store)
+        results["load_data (store)"] = measure(lambda: load_data(url), repeat, setup=clear_shared_reports)
+        results["load_data (dashboard columns)"] = measure(
+            lambda: load_data(url, columns=VIEW_COLUMNS["dashboard"]), repeat, setup=clear_shared_reports)
+        load_data(url)
+        results["load_data (attach)"] = measure(lambda: load_data(url), repeat, setup=cold)
+        report = load_data(url)
+        us_report = load_data(us_url)
+        sizes["report memory (all columns)"] = round(report.memory_usage(deep=True).sum() / 2 ** 20, 3)
+        sizes["report memory (dashboard columns)"] = round(
+            load_data(url, columns=VIEW_COLUMNS["dashboard"]).memory_usage(deep=True).sum() / 2 ** 20, 3)
+        results["country filter (boolean mask)"] = measure(lambda: report[report["Country_Region"] == "US"], repeat)
+        country_slice(report, "US")
+        results["country filter (row range)"] = measure(lambda: country_slice(report, "US"), repeat)
+
+        from src.pages.utils import metrics
+
+        def per_metric():
+            metrics.snapshot_totals(report, "US")
+            metrics.top_provinces(report, "US")
+            for feature in time_series_cube.METRIC_COLUMNS:
+                metrics.timeline(time_series, feature, "US")
+            metrics.day_change(time_series, "US")
+
+        per_metric()
+        results["metrics (per metric calls)"] = measure(per_metric, repeat)
+        results["metrics (selection_metrics)"] = measure(
+            lambda: metrics.selection_metrics(report, time_series, "US"), repeat)
+
+        results["plot_timeline (worldwide)"] = measure(
+            lambda: dashboard.plot_timeline(time_series, "Confirmed"), repeat, setup=cold)
+        results["plot_timeline (country)"] = measure(
+            lambda: dashboard.plot_timeline(time_series, "Confirmed", country="US"), repeat, setup=cold)
+        from src.pages.utils.us_time_series import CountySeriesLoader
+
+        def clear_us():
+            shutil.rmtree(os.path.join(shared_dataset.SHARED_PATH, "us_counties"), ignore_errors=True)
+
+        results["us county series (build)"] = measure(lambda: CountySeriesLoader().get(), repeat, setup=clear_us)
+        results["us county series (attach)"] = measure(lambda: CountySeriesLoader().get(), repeat)
+        counties = CountySeriesLoader().get()
+        state = counties.states()[0]
+        results["us state timeline"] = measure(lambda: counties.timeline("Confirmed", state), repeat)
+        results["us county timeline"] = measure(
+            lambda: counties.timeline("Confirmed", state, counties.counties_of(state)[0]), repeat)
+        countries = tuple(time_series["Country/Region"].cat.categories[:20])
+        results["plot_comparison (20 countries)"] = measure(
+            lambda: dashboard.plot_comparison(time_series, "Confirmed", countries, view="daily"), repeat, setup=cold)
+        timeline_figure, _ = dashboard.plot_timeline(time_series, "Confirmed")
+        results["compact_figure (worldwide timeline)"] = measure(
+            lambda: compact_figure(go.Figure(timeline_figure)), repeat)
+        for label, max_points in (("full", None), ("compact", CHART_WIDTH)):
+            figure = timeline_figure if label == "full" else compact_figure(timeline_figure, max_points)
+            sizes["timeline payload ({})".format(label)] = round(len(figure.to_json()) / 2 ** 20, 3)
+        results["plot_analytics (all countries)"] = measure(
+            lambda: dashboard.plot_analytics(time_series, "Confirmed", "average_per_capita", country="US"), repeat,
+            setup=lambda: (cold(), rolling_analytics._ANALYTICS.clear()))
+        results["plot_analytics (cached)"] = measure(
+            lambda: dashboard.plot_analytics(time_series, "Confirmed", "growth", country="US"), repeat, setup=cold)
+        results["plot_top_countries"] = measure(
+            lambda: dashboard.plot_top_countries(report, None, report_date), repeat, setup=cold)
+        results["plot_province_drilled"] = measure(
+            lambda: dashboard.plot_province_drilled(us_report, "US"), repeat, setup=cold)
+        try:
+            dashboard.mapbox_token()
+        except OSError:
+            print("  plot_province skipped: no mapbox token", file=sys.stderr)
+        else:
+            results["plot_province"] = measure(lambda: dashboard.plot_province(report, "US"), repeat, setup=cold)
+
+        return {"timings": results, "sizes_mb": sizes}
+    finally:
+        shutil.rmtree(source, ignore_errors=True)
+
+
+def compare(results, baseline, threshold, size_threshold):
+    """
+    Function lists the benchmarks that regressed beyond threshold times their baseline wall time
+    and the sizes that grew beyond size_threshold times their baseline size.
+
+    :param results: dict of scale -> run_scale result
+    :param baseline: dict, same shape as results
+    :param threshold: float
+    :param size_threshold: float
+    :return: list of str
+    """
+    failures = []
+    for scale, result in results.items():
+        reference = baseline.get(scale, {})
+        for name, measurement in result["timings"].items():
+            seconds = reference.get("timings", {}).get(name, {}).get("seconds")
+            if seconds and measurement["seconds"] > threshold * seconds:
+                failures.append("{} / {}: {:.4f}s vs baseline {:.4f}s".format(
+                    scale, name, measurement["seconds"], seconds))
+        for name, size in result["sizes_mb"].items():
+            baseline_size = reference.get("sizes_mb", {}).get(name)
+            if baseline_size and size > size_threshold * baseline_size:
+                failures.append("{} / {}: {:.3f}MB vs baseline {:.3f}MB".format(scale, name, size, baseline_size))
+
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", default=list(SCALES), choices=list(SCALES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="write the results to this json file")
+    parser.add_argument("--baseline", help="compare against this json file")
+    parser.add_argument("--threshold", type=float, default=1.5)
+    parser.add_argument("--size-threshold", type=float, default=1.1)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for scale in args.scales:
+        print("{}: {}".format(scale, SCALES[scale]), file=sys.stderr)
+        results[scale] = run_scale(scale, SCALES[scale], args.repeat)
+        for name, measurement in results[scale]["timings"].items():
+            print("  {:<38} {:>10.4f}s {:>10.3f}MB".format(name, measurement["seconds"], measurement["peak_mb"]))
+        for name, size in results[scale]["sizes_mb"].items():
+            print("  {:<38} {:>11} {:>10.3f}MB".format(name, "size", size))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(results, json.load(f), args.threshold, args.size_threshold)
+        for failure in failures:
+            print("REGRESSION {}".format(failure), file=sys.stderr)
+        return 1 if failures else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Generator for synthetic data laid out like the JHU CSSE repository (csse_covid_19_data), so the
+loaders and plots can be exercised at any scale without network access.
+"""
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+FIRST_DAY = datetime(2020, 1, 22)
+METRICS = ["confirmed", "deaths", "recovered"]
+
+
+def _cumulative(rng, n_rows, days, scale):
+    daily = rng.poisson(rng.uniform(0, scale, size=(n_rows, 1)), size=(n_rows, days))
+    return np.cumsum(daily, axis=1)
+
+
+def generate(path, countries=50, provinces=5, days=120, us_counties=0, reports=1, seed=0):
+    """
+    Function writes global time series, daily reports and the population lookup table in the JHU layout.
+
+    :param path: str, root directory, used as COVID_DATA_SOURCE
+    :param countries: int
+    :param provinces: int, provinces per country (every other country has none)
+    :param days: int, number of date columns in the time series
+    :param us_counties: int, county rows per province of the synthetic "US", in the daily reports
+                        and the US time series
+    :param reports: int, number of daily reports to write, ending on the last day
+    :param seed: int
+    :return: list of datetime objects, the dates of the daily reports
+    """
+    rng = np.random.default_rng(seed)
+    country_names = ["US"] + ["Country {:03d}".format(i) for i in range(1, countries)]
+    locations = []
+    for i, country in enumerate(country_names):
+        if i % 2 == 0 and provinces:
+            locations += [(country, "Province {:02d}".format(p)) for p in range(provinces)]
+        else:
+            locations.append((country, None))
+    locations = pd.DataFrame(locations, columns=["Country/Region", "Province/State"])
+    locations["Lat"] = rng.uniform(-50, 60, len(locations)).round(4)
+    locations["Long"] = rng.uniform(-160, 170, len(locations)).round(4)
+    dates = [FIRST_DAY + timedelta(days=d) for d in range(days)]
+    headers = ["{}/{}/{}".format(d.month, d.day, d.strftime("%y")) for d in dates]
+
+    confirmed = _cumulative(rng, len(locations), days, 200)
+    series = {"confirmed": confirmed,
+              "deaths": (confirmed * rng.uniform(0.005, 0.03, (len(locations), 1))).astype(int),
+              "recovered": (confirmed * rng.uniform(0.5, 0.9, (len(locations), 1))).astype(int)}
+    folder = os.path.join(path, "csse_covid_19_time_series")
+    os.makedirs(folder, exist_ok=True)
+    for metric in METRICS:
+        frame = pd.concat([locations[["Province/State", "Country/Region", "Lat", "Long"]],
+                           pd.DataFrame(series[metric], columns=headers)], axis=1)
+        frame.to_csv(os.path.join(folder, "time_series_covid19_{}_global.csv".format(metric)), index=False)
+    if us_counties:
+        us = locations[(locations["Country/Region"] == "US") & locations["Province/State"].notna()]
+        rows = [{"UID": 84000000 + 1000 * i + county, "iso2": "US", "iso3": "USA", "code3": 840,
+                 "FIPS": 1000 * i + county, "Admin2": "County {:04d}".format(county),
+                 "Province_State": us.at[i, "Province/State"], "Country_Region": "US",
+                 "Lat": us.at[i, "Lat"], "Long_": us.at[i, "Long"],
+                 "Combined_Key": "County {:04d}, {}, US".format(county, us.at[i, "Province/State"])}
+                for i in us.index for county in range(us_counties)]
+        counties = pd.DataFrame(rows)
+        location = [i for i in us.index for _ in range(us_counties)]
+        for metric in ("confirmed", "deaths"):
+            frame = counties.copy()
+            if metric == "deaths":
+                frame["Population"] = rng.integers(10 ** 3, 10 ** 6, len(frame))
+            values = series[metric][location] // us_counties
+            frame = pd.concat([frame, pd.DataFrame(values, columns=headers)], axis=1)
+            frame.to_csv(os.path.join(folder, "time_series_covid19_{}_US.csv".format(metric)), index=False)
+    pd.DataFrame({"Admin2": None, "Province_State": None, "Country_Region": country_names,
+                  "Population": rng.integers(10 ** 5, 10 ** 8, len(country_names))}).to_csv(
+        os.path.join(path, "UID_ISO_FIPS_LookUp_Table.csv"), index=False)
+
+    report_dates = dates[-reports:]
+    for offset, date in enumerate(report_dates):
+        column = days - reports + offset
+        rows = []
+        for i, (country, province) in locations[["Country/Region", "Province/State"]].iterrows():
+            counties = us_counties if country == "US" and province is not None else 0
+            for county in range(max(counties, 1)):
+                share = 1.0 / max(counties, 1)
+                rows.append({
+                    "FIPS": 1000 * i + county if counties else None,
+                    "Admin2": "County {:04d}".format(county) if counties else None,
+                    "Province_State": province,
+                    "Country_Region": country,
+                    "Last_Update": date.strftime("%Y-%m-%d 04:00:00"),
+                    "Lat": locations.at[i, "Lat"] + rng.uniform(-2, 2) * bool(counties),
+                    "Long_": locations.at[i, "Long"] + rng.uniform(-2, 2) * bool(counties),
+                    "Confirmed": int(series["confirmed"][i, column] * share),
+                    "Deaths": int(series["deaths"][i, column] * share),
+                    "Recovered": int(series["recovered"][i, column] * share),
+                })
+        report = pd.DataFrame(rows)
+        report["Active"] = report["Confirmed"] - report["Deaths"] - report["Recovered"]
+        report["Combined_Key"] = (report["Admin2"].fillna("") + ", " + report["Province_State"].fillna("")
+                                  + ", " + report["Country_Region"]).str.strip(", ")
+        report["Incident_Rate"] = rng.uniform(0, 5000, len(report)).round(2)
+        report["Case_Fatality_Ratio"] = (100 * report["Deaths"] / report["Confirmed"].clip(lower=1)).round(3)
+        for folder_name in ("csse_covid_19_daily_reports", "csse_covid_19_daily_reports_us"):
+            folder = os.path.join(path, folder_name)
+            os.makedirs(folder, exist_ok=True)
+            frame = report if folder_name.endswith("reports") else report[report["Country_Region"] == "US"]
+            frame.to_csv(os.path.join(folder, "{}.csv".format(date.strftime("%m-%d-%Y"))), index=False)
+
+    return report_dates
@@ -0,0 +1,87 @@
+"""
+Headless serving mode: exposes the Dashboard aggregates as versioned JSON so that viewers do
+not each run pandas.
+
+    python serve.py --port 8502
+
+Routes (all GET, optional ?country=...):
+    /v1/version, /v1/snapshot, /v1/top?n=10, /v1/timeline?feature=Confirmed,
+    /v1/analytics?analytic=average&feature=Confirmed, /v1/day_change?date=2021-03-01, /v1/provinces?country=...,
+    /v1/compare?countries=A|B&view=daily&start=2020-03-01, /v1/headline, /v1/selection?n=10, /metrics
+"""
+import argparse
+import json
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+from src.pages.utils.aggregates_api import BadRequest, NotFound, respond
+from src.pages.utils.fetch_url import fetch_url
+from src.pages.utils.load_data import VIEW_COLUMNS, load_data
+from src.pages.utils.load_time_series import load_time_series
+from src.pages.utils.report_index import latest_report_date
+from src.pages.utils.tracing import tracer
+
+MAX_AGE = 60
+
+
+class AggregatesHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/metrics":
+            self._send(200, tracer.export_prometheus().encode(), "text/plain; version=0.0.4")
+            return
+        try:
+            report = load_data(fetch_url(latest_report_date()), columns=VIEW_COLUMNS["dashboard"])
+            time_series = load_time_series()["Confirmed"]
+            body, etag = respond(url.path, dict(parse_qsl(url.query)), report, time_series)
+        except BadRequest as e:
+            self._send_error(400, str(e))
+            return
+        except NotFound as e:
+            self._send_error(404, str(e))
+            return
+        except LookupError as e:
+            self._send_error(503, str(e))
+            return
+        except Exception:
+            traceback.print_exc()
+            self._send_error(500, "Internal server error")
+            return
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", etag=etag)
+            return
+        self._send(200, body, etag=etag)
+
+    def _send(self, status, body, content_type="application/json", etag=None,
+              cache_control="public, max-age={}".format(MAX_AGE)):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Cache-Control", cache_control)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send(status, json.dumps({"error": message}).encode(), cache_control="no-store")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), AggregatesHandler)
+    print("Serving aggregates on http://{}:{}".format(args.host, args.port))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,38 @@
 import os
 import streamlit as st
-import numpy as np
 import plotly.express as px
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
 import plotly.io as pio
-from datetime import datetime, timedelta
+from requests import RequestException
+from src.pages.utils.api_client import (analytics_timeline, compare, day_change, snapshot_totals, timeline,
+                                        top_countries, top_provinces)
+from src.pages.utils.chart_payload import CHART_WIDTH, compact_figure
 from src.pages.utils.fetch_url import fetch_url
-from src.pages.utils.load_data import load_data
+from src.pages.utils.fetcher import get_fetcher
+from src.pages.utils.figure_cache import cached
+from src.pages.utils.figure_store import ensure_warm, stored_figure
+from src.pages.utils.load_data import VIEW_COLUMNS, load_data
+from src.pages.utils.geo_layer import level_of_detail, mapbox_token, prepare_geo
 from src.pages.utils.load_css import local_css
 from src.pages.utils.load_time_series import load_time_series
-
-
-@st.cache
+from src.pages.utils.report_index import get_report_index, latest_report_date
+from src.pages.utils.report_range import ensure_history
+from src.pages.utils.rolling_analytics import ANALYTICS, get_analytics
+from src.pages.utils.snapshot_store import ingest_report
+from src.pages.utils.time_series_cube import get_cube
+from src.pages.utils.tracing import payload_size, traced, tracer
+from src.pages.utils.us_time_series import US_METRICS, load_us_time_series
+
+# name -> label of the comparison views besides the rolling ANALYTICS
+COMPARE_VIEWS = {
+    "cumulative": "Cumulative",
+    "daily": "Daily delta",
+}
+
+
+@traced("render.plot_snapshot_numbers")
+@cached
 def plot_snapshot_numbers(df, colors, date, country=None):
     """
     Function plots snapshots for worldwide and countries.
@@ -25,12 +45,11 @@ def plot_snapshot_numbers(df, colors, date, country=None):
     """
     with st.spinner("Rendering chart..."):
         colors = px.colors.qualitative.D3
-        if country:
-            df = df[df["Country_Region"] == country]
+        totals = snapshot_totals(df, country)
         fig = go.Figure()
-        fig.add_trace(go.Bar(y=df[["Confirmed", "Deaths", "Recovered", "Active"]].columns.tolist(),
-                             x=df[["Confirmed", "Deaths", "Recovered", "Active"]].sum().values,
-                             text=df[["Confirmed", "Deaths", "Recovered", "Active"]].sum().values,
+        fig.add_trace(go.Bar(y=totals.index.tolist(),
+                             x=totals.values,
+                             text=totals.values,
                              orientation='h',
                              marker=dict(color=[colors[1], colors[3], colors[2], colors[0]]),
                              ),
@@ -53,52 +72,51 @@ def plot_snapshot_numbers(df, colors, date, country=None):
     return fig
 
 
-@st.cache
-def plot_top_countries(df, colors, date):
+@traced("render.plot_top_countries")
+@cached
+def plot_top_countries(df, colors, date, n=10):
     """
     Function plots top countries by confirmed, deaths, recovered, active cases.
 
     :param df: DataFrame
     :param colors: list
     :param date: datetime object
+    :param n: int, number of countries per chart
     :return: plotly.figure
     """
     with st.spinner("Rendering chart..."):
-        temp = df.groupby("Country_Region").agg({"Confirmed": "sum",
-                                                 "Deaths": "sum",
-                                                 "Recovered": "sum",
-                                                 "Active": "sum"})
+        top = top_countries(df, n)
         colors = px.colors.qualitative.Prism
-        fig = make_subplots(2, 2, subplot_titles=["Top 10 Countries by cases",
-                                                  "Top 10 Countries by deaths",
-                                                  "Top 10 Countries by recoveries",
-                                                  "Top 10 Countries by active cases"])
-        fig.append_trace(go.Bar(x=temp["Confirmed"].nlargest(n=10),
-                                y=temp["Confirmed"].nlargest(n=10).index,
+        fig = make_subplots(2, 2, subplot_titles=["Top {} Countries by cases".format(n),
+                                                  "Top {} Countries by deaths".format(n),
+                                                  "Top {} Countries by recoveries".format(n),
+                                                  "Top {} Countries by active cases".format(n)])
+        fig.append_trace(go.Bar(x=top["Confirmed"],
+                                y=top["Confirmed"].index,
                                 orientation='h',
                                 marker=dict(color=colors),
                                 hovertemplate='<br>Count: %{x:,.2f}',
                                 ),
                          row=1, col=1)
 
-        fig.append_trace(go.Bar(x=temp["Deaths"].nlargest(n=10),
-                                y=temp["Deaths"].nlargest(n=10).index,
+        fig.append_trace(go.Bar(x=top["Deaths"],
+                                y=top["Deaths"].index,
                                 orientation='h',
                                 marker=dict(color=colors),
                                 hovertemplate='<br>Count: %{x:,.2f}',
                                 ),
                          row=2, col=1)
 
-        fig.append_trace(go.Bar(x=temp["Recovered"].nlargest(n=10),
-                                y=temp["Recovered"].nlargest(n=10).index,
+        fig.append_trace(go.Bar(x=top["Recovered"],
+                                y=top["Recovered"].index,
                                 orientation='h',
                                 marker=dict(color=colors),
                                 hovertemplate='<br>Count: %{x:,.2f}',
                                 ),
                          row=1, col=2)
 
-        fig.append_trace(go.Bar(x=temp["Active"].nlargest(n=10),
-                                y=temp["Active"].nlargest(n=10).index,
+        fig.append_trace(go.Bar(x=top["Active"],
+                                y=top["Active"].index,
                                 orientation='h',
                                 marker=dict(color=colors),
                                 hovertemplate='<br>Count: %{x:,.2f}'),
@@ -116,22 +134,15 @@ def plot_top_countries(df, colors, date):
     return fig
 
 
-@st.cache(allow_output_mutation=True)
-def plot_timeline(df, feature, country=None):
+def timeline_figure(temp, feature):
     """
-    Function plots  time series charts for worldwide as well as countries
-    :param df: DataFrame
+    Function draws the cumulative and daily delta charts of a timeline.
+
+    :param temp: DataFrame with Date, feature and Delta_feature columns
     :param feature: str
-    :param country: str
-    :return: plotly.figure, DataFrame
+    :return: plotly.figure
     """
     color = px.colors.qualitative.Prism
-    if country:
-        df = df[df["Country/Region"] == country]
-    temp = df.groupby(["Date"]).agg({feature: "sum"}).reset_index()
-    temp["Delta_{}".format(feature)] = temp[feature].diff()
-    temp["Delta_{}".format(feature)].clip(0, inplace=True)
-
     fig = make_subplots(2, 1, subplot_titles=["Cumulative {}".format(feature),
                                               "Daily Delta {}".format(feature)])
     fig.add_trace(go.Scatter(
@@ -156,54 +167,232 @@ def plot_timeline(df, feature, country=None):
     fig.update_layout(height=800,
                       showlegend=False)
 
-    return fig, temp
+    return fig
+
+
+@traced("render.plot_timeline")
+@cached
+def plot_timeline(df, feature, country=None, end=None):
+    """
+    Function plots  time series charts for worldwide as well as countries
+    :param df: DataFrame
+    :param feature: str
+    :param country: str
+    :param end: datetime object, last date shown, every date when None
+    :return: plotly.figure, DataFrame
+    """
+    temp = timeline(df, feature, country)
+    if end is not None:
+        temp = temp[temp["Date"] <= end]
+
+    return timeline_figure(temp, feature), temp
+
+
+@traced("render.plot_us_timeline")
+@cached
+def plot_us_timeline(series, feature, state, county=None):
+    """
+    Function plots the time series charts of a US state or county.
+
+    :param series: CountySeries
+    :param feature: str
+    :param state: str
+    :param county: str
+    :return: plotly.figure
+    """
+    return timeline_figure(series.timeline(feature, state, county), feature)
 
 
-@st.cache
-def plot_province_drilled(df, country):
+def us_timelines(max_points):
+    """
+    Function renders the state and county timelines of the US drill-down.
+
+    :param max_points: int
+    :return: None
+    """
+    try:
+        series = load_us_time_series()
+    except (OSError, RequestException):
+        st.info("Sorry we do not have state/county level time series for the US")
+        return
+    state = st.selectbox("State", series.states())
+    county = st.selectbox("County", ["All counties"] + series.counties_of(state))
+    feature = st.selectbox("Metric", list(US_METRICS))
+    fig = plot_us_timeline(series, feature, state, None if county == "All counties" else county)
+    plotly_chart(fig, "us_timeline", max_points)
+
+
+@traced("render.plot_analytics")
+@cached
+def plot_analytics(df, feature, analytic, country=None, end=None):
+    """
+    Function plots a rolling analytic of a time series, the daily deltas are drawn underneath
+    the moving averages.
+
+    :param df: DataFrame
+    :param feature: str
+    :param analytic: str, one of ANALYTICS
+    :param country: str
+    :param end: datetime object, last date shown, every date when None
+    :return: plotly.figure
+    """
+    color = px.colors.qualitative.Prism
+    label = ANALYTICS[analytic]
+    temp = analytics_timeline(df, analytic, feature, country)
+    if end is not None:
+        temp = temp[temp["Date"] <= end]
+
+    fig = go.Figure()
+    if analytic == "average":
+        daily = timeline(df, feature, country)
+        if end is not None:
+            daily = daily[daily["Date"] <= end]
+        fig.add_trace(go.Bar(
+            x=daily["Date"],
+            y=daily["Delta_{}".format(feature)],
+            marker=dict(color=color[6]),
+            opacity=0.4,
+            hovertemplate='Date: %{x} <br>Count: %{y:,.2f}'))
+    fig.add_trace(go.Scatter(
+        x=temp["Date"],
+        y=temp[analytic],
+        marker=dict(color=color[2]),
+        line=dict(width=4),
+        hovertemplate='Date: %{x} <br>Value: %{y:,.2f}'))
+    fig.update_yaxes(showgrid=False, title=label)
+    fig.update_xaxes(showgrid=False, showspikes=True)
+    fig.update_layout(title="{} {}".format(label, feature),
+                      height=600,
+                      showlegend=False)
+
+    return fig
+
+
+def timeline_options(time_series):
+    """
+    Function lists the Timeline views, leaving out per capita ones when population data is missing.
+
+    :param time_series: DataFrame
+    :return: dict of label -> analytic, None for the cumulative and daily charts
+    """
+    options = {"Cumulative and daily": None}
+    has_population = get_analytics(time_series).has_population
+    for analytic, label in ANALYTICS.items():
+        if has_population or "per_capita" not in analytic:
+            options[label] = analytic
+
+    return options
+
+
+@traced("render.plot_comparison")
+@cached
+def plot_comparison(df, feature, countries, start=None, end=None, view="cumulative"):
+    """
+    Function plots the series of several countries as overlaid traces on shared axes.
+
+    :param df: DataFrame
+    :param feature: str
+    :param countries: tuple of str
+    :param start: datetime object
+    :param end: datetime object
+    :param view: str, "cumulative", "daily" or one of ANALYTICS
+    :return: plotly.figure
+    """
+    color = px.colors.qualitative.Dark24
+    temp = compare(df, feature, countries, start, end, view)
+    label = COMPARE_VIEWS.get(view, ANALYTICS.get(view))
+
+    fig = go.Figure()
+    for i, country in enumerate(countries):
+        fig.add_trace(go.Scatter(
+            x=temp["Date"],
+            y=temp[country],
+            name=country,
+            mode="lines",
+            line=dict(color=color[i % len(color)], width=3),
+            hovertemplate='%{y:,.2f}'))
+    fig.update_yaxes(showgrid=False, title=label)
+    fig.update_xaxes(showgrid=False, showspikes=True)
+    fig.update_layout(title="{} {}".format(label, feature),
+                      height=600,
+                      hovermode="x unified")
+
+    return fig
+
+
+def compare_countries(df, time_series_dict, max_points):
+    """
+    Function renders the multi-country comparison view.
+
+    :param df: DataFrame, daily report
+    :param time_series_dict: dict
+    :param max_points: int
+    :return: None
+    """
+    st.title("Compare countries")
+    time_series = time_series_dict["Confirmed"]
+    available = list(time_series["Country/Region"].cat.categories)
+    leaders = [country for country in top_countries(df, 5)["Confirmed"].index if country in available]
+    countries = st.multiselect("Countries", available, leaders)
+    if not countries:
+        st.info("Select at least one country to compare")
+        return
+    feature = st.selectbox("Select one", ["Confirmed", "Deaths", "Recovered"])
+    options = {label: view for view, label in COMPARE_VIEWS.items()}
+    options.update({label: analytic for label, analytic in timeline_options(time_series).items() if analytic})
+    view = options[st.selectbox("Show", list(options))]
+    dates = get_cube(time_series).dates
+    # Sliders over dates are not available in the pinned streamlit version, so the window is a
+    # range of positions in the list of dates.
+    first, last = st.slider("Date window", 0, len(dates) - 1, (0, len(dates) - 1))
+    st.text("{} to {}".format(dates[first].strftime("%d %B, %Y"), dates[last].strftime("%d %B, %Y")))
+    fig = plot_comparison(time_series, feature, tuple(countries), dates[first], dates[last], view)
+    plotly_chart(fig, "compare", max_points)
+
+
+@traced("render.plot_province_drilled")
+@cached
+def plot_province_drilled(df, country, n=10):
     """
     Function computes top provinces by confirmed, deaths, recovered and active cases.
 
     :param df: DataFrame
     :param country: str
+    :param n: int, number of provinces per chart
     :return: plotly.figure
     """
-    fig = make_subplots(2, 2, subplot_titles=["Top 10 States by cases",
-                                              "Top 10 States by deaths",
-                                              "Top 10 States by recoveries",
-                                              "Top 10 States by active cases"])
-    df = df[df["Country_Region"] == country]
-    df = df.groupby(["Province_State"]).agg({"Confirmed": "sum",
-                                             "Deaths": "sum",
-                                             "Recovered": "sum",
-                                             "Active": "sum"})
+    fig = make_subplots(2, 2, subplot_titles=["Top {} States by cases".format(n),
+                                              "Top {} States by deaths".format(n),
+                                              "Top {} States by recoveries".format(n),
+                                              "Top {} States by active cases".format(n)])
+    top = top_provinces(df, country, n)
     colors = px.colors.qualitative.Prism
-    fig.append_trace(go.Bar(y=df["Confirmed"].nlargest(10).index,
-                            x=df["Confirmed"].nlargest(10),
+    fig.append_trace(go.Bar(y=top["Confirmed"].index,
+                            x=top["Confirmed"],
                             orientation='h',
                             marker=dict(color=colors),
                             hovertemplate='<br>Count: %{x:,.2f}',
                             ),
                      row=1, col=1)
 
-    fig.append_trace(go.Bar(y=df["Deaths"].nlargest(10).index,
-                            x=df["Deaths"].nlargest(10),
+    fig.append_trace(go.Bar(y=top["Deaths"].index,
+                            x=top["Deaths"],
                             orientation='h',
                             marker=dict(color=colors),
                             hovertemplate='<br>Count: %{x:,.2f}',
                             ),
                      row=2, col=1)
 
-    fig.append_trace(go.Bar(y=df["Recovered"].nlargest(10).index,
-                            x=df["Recovered"].nlargest(10),
+    fig.append_trace(go.Bar(y=top["Recovered"].index,
+                            x=top["Recovered"],
                             orientation='h',
                             marker=dict(color=colors),
                             hovertemplate='<br>Count: %{x:,.2f}',
                             ),
                      row=1, col=2)
 
-    fig.append_trace(go.Bar(y=df["Active"].nlargest(10).index,
-                            x=df["Active"].nlargest(10),
+    fig.append_trace(go.Bar(y=top["Active"].index,
+                            x=top["Active"],
                             orientation='h',
                             marker=dict(color=colors),
                             hovertemplate='<br>Count: %{x:,.2f}',
@@ -221,7 +410,7 @@ def plot_province_drilled(df, country):
     return fig
 
 
-def load_day_change(time_series_dict, keys, granularity, country=None):
+def load_day_change(time_series_dict, keys, granularity, country=None, date=None):
     """
     Function computes the delta change in confirmed, deaths, recovered and active cases over a single day
 
@@ -229,31 +418,19 @@ def load_day_change(time_series_dict, keys, granularity, country=None):
     :param keys: list
     :param granularity: str
     :param country: str
+    :param date: datetime object, the day ending the change, the most recent one when None
     :return: plotly.figure
     """
     response_dict = {}
     PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
     local_css(PATH + "/style.css")
-    curr = 0
-    prev = 0
-    for key in keys:
-        if granularity == "Country":
-            _, temp = plot_timeline(time_series_dict[key], key, country=country)
-        else:
-            _, temp = plot_timeline(time_series_dict[key], key)
-        prev = temp.iloc[-2, -2]
-        curr = temp.iloc[-1, -2]
-        if (curr - prev) >= 0:
+    change = day_change(time_series_dict["Confirmed"], country if granularity == "Country" else None, date)
+    for key in list(keys) + ["Active"]:
+        if change[key] >= 0:
             arrow = "&uarr;"
         else:
             arrow = "&darr;"
-        response_dict[key] = [arrow, abs(curr - prev)]
-
-    val = response_dict["Confirmed"][1] - response_dict["Deaths"][1] - response_dict["Recovered"][1]
-    if val >= 0:
-        response_dict["Active"] = ["&uarr;", abs(val)]
-    else:
-        response_dict["Active"] = ["&darr;", abs(val)]
+        response_dict[key] = [arrow, abs(change[key])]
 
     st.write("\n")
     st.write("\n")
@@ -266,88 +443,148 @@ def load_day_change(time_series_dict, keys, granularity, country=None):
     st.markdown(t, unsafe_allow_html=True)
 
 
-@st.cache(suppress_st_warning=True)
-def plot_province(df, country):
+@traced("render.plot_province")
+@cached
+def plot_province(df, country, zoom=3):
     """
     Function plots the map of a country with the state/county level information as a hover.
 
     :param df: DataFrame
     :param country: str
+    :param zoom: int, level of detail the points are binned for
     :return: plotly.figure
     """
     fig = None
-    df = df[df["Country_Region"] == country]
-    if df["Province_State"].isnull().all():
-        st.info("Sorry we do not have province/state level information for {}".format(country))
-    else:
-        df.rename(columns={"Lat": "lat",
-                           "Long_": "lon",
-                           "Admin2": "City"}, inplace=True)
-        df["City"].fillna("Not Available", inplace=True)
-        df.loc[:, 'Scaled Confirmed'] = df.loc[:, 'Confirmed'].apply(lambda s: np.log(s))
-        df.loc[:, 'Scaled Confirmed'] = df.loc[:, 'Scaled Confirmed'].apply(
-            lambda s: 0 if s == -np.inf else s)
-        df["Province_State"].fillna("Not Available", inplace=True)
-        temp = df[["lat", "lon"]]
-        temp.dropna(inplace=True)
-        with open("src/pages/utils/tokens/.mapbox_token") as tfile:
-            token = tfile.read()
-        fig = px.scatter_mapbox(df, lat="lat", lon="lon", zoom=3, height=600, width=800,
+    geo = prepare_geo(df, country)
+    if geo is not None:
+        fig = px.scatter_mapbox(level_of_detail(geo, zoom), lat="lat", lon="lon", zoom=3, height=600, width=800,
                                 size="Scaled Confirmed",
                                 color="Incident_Rate",
                                 color_continuous_scale=px.colors.sequential.Hot,
                                 hover_name="Combined_Key", hover_data=["City", "Province_State", "Confirmed",
                                                                        "Deaths", "Recovered"])
         fig.update_traces(opacity=0.7)
-        fig.update_layout(mapbox_style="dark", height=1000, width=1000, mapbox_accesstoken=token)
+        fig.update_layout(mapbox_style="dark", height=1000, width=1000, mapbox_accesstoken=mapbox_token())
         fig.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0})
 
     return fig
 
 
+def plotly_chart(fig, view, max_points=CHART_WIDTH):
+    """
+    Function renders a figure with compact trace data, recording its payload size and serialization time.
+
+    :param fig: plotly.figure
+    :param view: str
+    :param max_points: int, points per line or bar trace, None keeps full resolution
+    :return: None
+    """
+    fig = compact_figure(fig, max_points)
+    tracer.observe_size("chart.{}".format(view), payload_size(fig))
+    with tracer.span("render.plotly_chart"):
+        st.plotly_chart(fig)
+
+
+def select_report_date(latest):
+    """
+    Function renders the report date slider over every report in the local store. Only the
+    selected date's partition is read.
+
+    :param latest: datetime object
+    :return: datetime object
+    """
+    dates = [date for date in get_report_index().dates() if date <= latest]
+    if len(dates) < 2:
+        return latest
+    # Sliders over dates are not available in the pinned streamlit version, so the slider picks
+    # a position in the list of stored reports.
+    position = st.sidebar.slider("Report date", 0, len(dates) - 1, len(dates) - 1)
+    st.sidebar.text(dates[position].strftime("%d %B, %Y"))
+
+    return dates[position]
+
+
 def main():
     pio.templates.default = "plotly_dark"
-    date = datetime.today()
-    df = None
-    while True:
-        try:
-            df = load_data(fetch_url(date))
-        except Exception as e:
-            date = date - timedelta(days=1)
-            continue
-        break
+    try:
+        latest = latest_report_date()
+    except LookupError as e:
+        st.error("Data is currently unavailable: {}".format(e))
+        return
+    ensure_history()
+    date = select_report_date(latest)
+    df = load_data(fetch_url(date), columns=VIEW_COLUMNS["dashboard"])
     time_series_dict = load_time_series()
-    granularity = st.sidebar.selectbox("Granularity", ["Worldwide", "Country"])
+    # Time series views follow the report date slider; end is None on the latest report so that
+    # the pre-rendered full history is served.
+    end = None
+    if date == latest:
+        ensure_warm(df, time_series_dict["Confirmed"])
+    else:
+        end = date
+    # Charts are downsampled to the chart width; zooming into a downsampled chart does not fetch
+    # more points in the pinned streamlit version, so full resolution is an explicit choice.
+    max_points = None if st.sidebar.checkbox("Full resolution charts") else CHART_WIDTH
+    granularity = st.sidebar.selectbox("Granularity", ["Worldwide", "Country", "Compare"])
     if granularity == "Country":
         country = st.sidebar.selectbox("country", df["Country_Region"].unique())
         st.title(country)
         graph_type = st.selectbox("Choose visualization", ["Total Count",
                                                            "Timeline",
                                                            "Province/State"])
+        # Countries the time series does not list (renamed or dropped upstream) only have report views.
+        has_series = get_cube(time_series_dict["Confirmed"]).has_country(country)
         if graph_type == "Total Count":
-            st.subheader("One day change")
-            load_day_change(time_series_dict, time_series_dict.keys(), granularity, country=country)
-            fig = plot_snapshot_numbers(df, px.colors.qualitative.D3, date.date(), country)
-            st.plotly_chart(fig)
+            if has_series:
+                st.subheader("One day change")
+                load_day_change(time_series_dict, time_series_dict.keys(), granularity, country=country, date=date)
+            fig = stored_figure("snapshot", df,
+                                lambda: plot_snapshot_numbers(df, px.colors.qualitative.D3, date.date(), country),
+                                country=country)
+            plotly_chart(fig, "snapshot", max_points)
+        elif graph_type == "Timeline" and not has_series:
+            st.info("Sorry we do not have a time series for {}".format(country))
         elif graph_type == "Timeline":
             feature = st.selectbox("Select one", ["Confirmed", "Deaths", "Recovered"])
-            fig, _ = plot_timeline(time_series_dict[feature], feature, country=country)
-            st.plotly_chart(fig)
+            options = timeline_options(time_series_dict[feature])
+            analytic = options[st.selectbox("Show", list(options))]
+            if analytic is None and end is None:
+                fig = stored_figure("timeline", time_series_dict[feature],
+                                    lambda: plot_timeline(time_series_dict[feature], feature, country=country)[0],
+                                    country=country, feature=feature)
+            elif analytic is None:
+                fig, _ = plot_timeline(time_series_dict[feature], feature, country, end)
+            else:
+                fig = plot_analytics(time_series_dict[feature], feature, analytic, country, end)
+            plotly_chart(fig, "timeline", max_points)
         elif graph_type == "Province/State":
-            fig = plot_province(df, country)
-            if fig is not None:
+            if country == "US":
+                # Fetch the US report while the map renders so the summary does not block on it.
+                get_fetcher().submit(ingest_report, "us", date)
+            zoom = st.slider("Map detail", 1, 8, 3)
+            fig = stored_figure("province", df, lambda: plot_province(df, country, zoom), country=country,
+                                feature=None if zoom == 3 else "zoom{}".format(zoom))
+            if fig is None:
+                st.info("Sorry we do not have province/state level information for {}".format(country))
+            else:
                 fig_drilled = None
                 flag = st.checkbox("Summary (click and scroll)")
                 st.subheader("Hover Map")
-                st.plotly_chart(fig)
+                plotly_chart(fig, "province", max_points)
                 if flag:
                     if country == "US":
-                        fig_drilled = plot_province_drilled(load_data(fetch_url(date, country="US")), country)
+                        fig_drilled = plot_province_drilled(load_data(fetch_url(date, country="US"),
+                                                                      columns=VIEW_COLUMNS["totals"]), country)
                     else:
-                        fig_drilled = plot_province_drilled(df, country)
+                        fig_drilled = stored_figure("province_drilled", df, lambda: plot_province_drilled(df, country),
+                                                    country=country)
                 if fig_drilled is not None:
                     st.subheader("Summary")
-                    st.plotly_chart(fig_drilled)
+                    plotly_chart(fig_drilled, "province_drilled", max_points)
+                if country == "US" and st.checkbox("State and county timelines"):
+                    us_timelines(max_points)
+    elif granularity == "Compare":
+        compare_countries(df, time_series_dict, max_points)
     else:
         # TODO(Sayar): Add values for deltas
         st.title("Worldwide")
@@ -358,13 +595,19 @@ def main():
                                                                    "Timeline"])
         if graph_type == "Total Count":
             st.subheader("One day change")
-            load_day_change(time_series_dict, time_series_dict.keys(), granularity)
+            load_day_change(time_series_dict, time_series_dict.keys(), granularity, date=date)
             fig = plot_snapshot_numbers(df, px.colors.qualitative.D3, date.date())
-            st.plotly_chart(fig)
+            plotly_chart(fig, "snapshot", max_points)
         elif graph_type == "Top affected/recovered":
-            fig = plot_top_countries(df, px.colors.qualitative.D3, date.date())
-            st.plotly_chart(fig)
+            n = st.sidebar.slider("Number of countries", 5, 30, 10)
+            fig = plot_top_countries(df, px.colors.qualitative.D3, date.date(), n)
+            plotly_chart(fig, "top_countries", max_points)
         elif graph_type == "Timeline":
             feature = st.selectbox("Select one", ["Confirmed", "Deaths", "Recovered"])
-            fig, _ = plot_timeline(time_series_dict[feature], feature)
-            st.plotly_chart(fig)
+            options = timeline_options(time_series_dict[feature])
+            analytic = options[st.selectbox("Show", list(options))]
+            if analytic is None:
+                fig, _ = plot_timeline(time_series_dict[feature], feature, end=end)
+            else:
+                fig = plot_analytics(time_series_dict[feature], feature, analytic, end=end)
+            plotly_chart(fig, "timeline", max_points)
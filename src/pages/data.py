@@ -1,7 +1,8 @@
 import streamlit as st
-from datetime import datetime, timedelta
 from src.pages.utils.load_data import load_data
 from src.pages.utils.fetch_url import fetch_url
+from src.pages.utils.metrics import headline_stats
+from src.pages.utils.report_index import latest_report_date
 from PIL import Image
 
 
@@ -9,33 +10,30 @@ def main():
     img = Image.open("assets/covid-19-4960246_640.jpg")
     st.image(img)
     st.title("Data")
-    date = datetime.today()
-    df = None
     load_state = st.text('Loading data......')
-    while True:
-        try:
-            df = load_data(fetch_url(date))
-        except Exception as e:
-            date = date - timedelta(days=1)
-            continue
-        break
+    try:
+        date = latest_report_date()
+    except LookupError as e:
+        load_state.text("")
+        st.error("Data is currently unavailable: {}".format(e))
+        return
+    df = load_data(fetch_url(date))
     load_state.text("Loading data......done!")
 
     if st.checkbox("Show raw data"):
         st.subheader('Raw data')
         st.write(df)
     st.subheader("The numbers so far")
-    st.markdown("* There are **{}** countries that have been affected by the COVID-19 virus.".format(len(df["Country_Region"].unique())))
-    st.markdown("* The virus has affected **{:.2f}M** people and caused the death of **{:.2f}K**.".format(df["Confirmed"].sum()/1000000,
-                                                                                                df["Deaths"].sum()/1000))
-    h_confirmed = df.groupby("Country_Region").agg({"Confirmed": "sum"}).nlargest(1,"Confirmed")
-    st.markdown("* **{}** has the largest number of confirmed cases with **{:.2f}M** confirmed cases.".format(h_confirmed.index.values[0],
-                                                                                      h_confirmed["Confirmed"].values[0]/1000000))
-    h_deaths = df.groupby("Country_Region").agg({"Deaths": "sum"}).nlargest(1,"Deaths")
-    st.markdown("* **{}** has the largest number of deaths with **{:.2f}K** deaths.".format(h_deaths.index.values[0],
-                                                                                                      h_deaths["Deaths"].values[0]/1000))
-    h_recovered = df.groupby("Country_Region").agg({"Recovered": "sum"}).nlargest(1,"Recovered")
-    st.markdown("* **{}** has the largest number of recoveries with **{:.2f}M** recovered.".format(h_recovered.index.values[0],
-                                                                                           h_recovered["Recovered"].values[0]/1000000))
-
-
+    stats = headline_stats(df)
+    st.markdown("* There are **{}** countries that have been affected by the COVID-19 virus.".format(stats["countries"]))
+    st.markdown("* The virus has affected **{:.2f}M** people and caused the death of **{:.2f}K**.".format(stats["totals"]["Confirmed"]/1000000,
+                                                                                                stats["totals"]["Deaths"]/1000))
+    h_confirmed = stats["leaders"]["Confirmed"]
+    st.markdown("* **{}** has the largest number of confirmed cases with **{:.2f}M** confirmed cases.".format(h_confirmed[0],
+                                                                                      h_confirmed[1]/1000000))
+    h_deaths = stats["leaders"]["Deaths"]
+    st.markdown("* **{}** has the largest number of deaths with **{:.2f}K** deaths.".format(h_deaths[0],
+                                                                                                      h_deaths[1]/1000))
+    h_recovered = stats["leaders"]["Recovered"]
+    st.markdown("* **{}** has the largest number of recoveries with **{:.2f}M** recovered.".format(h_recovered[0],
+                                                                                           h_recovered[1]/1000000))
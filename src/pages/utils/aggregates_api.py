@@ -0,0 +1,175 @@
+import hashlib
+import json
+import math
+
+import numpy as np
+import pandas as pd
+from src.pages.utils import metrics
+from src.pages.utils.data_version import data_version
+from src.pages.utils.figure_cache import figure_cache
+from src.pages.utils.tracing import traced
+
+API_VERSION = "v1"
+
+
+class NotFound(Exception):
+    pass
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _positive_int(params, name, default):
+    """
+    Function reads a positive integer query parameter.
+
+    :param params: dict of str -> str
+    :param name: str
+    :param default: int
+    :return: int
+    """
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise BadRequest("{} must be an integer".format(name))
+    if value < 1:
+        raise BadRequest("{} must be positive".format(name))
+
+    return value
+
+
+def _date(params, name):
+    """
+    Function reads an optional date query parameter.
+
+    :param params: dict of str -> str
+    :param name: str
+    :return: Timestamp or None
+    """
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return pd.Timestamp(value)
+    except ValueError:
+        raise BadRequest("{} must be a date, e.g. 2020-03-01".format(name))
+
+
+def _plain(value):
+    """
+    Function converts numpy/pandas values into JSON serializable python values.
+
+    :param value: object
+    :return: object
+    """
+    if isinstance(value, pd.Series):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, pd.DataFrame):
+        return {str(key): _plain(row) for key, row in value.iterrows()}
+    if isinstance(value, dict):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray, pd.Index)):
+        return [_plain(item) for item in value]
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).strftime("%Y-%m-%d")
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if math.isnan(value) else float(value)
+
+    return value
+
+
+def _timeline(time_series, feature, country):
+    temp = metrics.timeline(time_series, feature, country)
+
+    return {"dates": temp["Date"].values, "values": temp[feature].values,
+            "deltas": temp["Delta_{}".format(feature)].values}
+
+
+def _analytics(time_series, analytic, feature, country):
+    temp = metrics.analytics_timeline(time_series, analytic, feature, country)
+
+    return {"dates": temp["Date"].values, "values": temp[analytic].values}
+
+
+def _selection(report, time_series, country, n):
+    selection = metrics.selection_metrics(report, time_series, country, n)
+    selection["timelines"] = {
+        metric: {"dates": temp["Date"].values, "values": temp[metric].values,
+                 "deltas": temp["Delta_{}".format(metric)].values}
+        for metric, temp in selection["timelines"].items()}
+
+    return selection
+
+
+def _compare(time_series, params):
+    countries = [country for country in params.get("countries", "").split("|") if country]
+    temp = metrics.compare(time_series, params.get("feature", "Confirmed"), countries, _date(params, "start"),
+                           _date(params, "end"), params.get("view", "cumulative"))
+
+    return {"dates": temp["Date"].values, "values": temp[countries].values}
+
+
+def aggregate(path, params, report, time_series):
+    """
+    Function computes the payload of an API route.
+    Raises NotFound for unknown routes or values and BadRequest for malformed parameters.
+
+    :param path: str, e.g. "/v1/timeline"
+    :param params: dict of str -> str, query parameters
+    :param report: DataFrame, daily report
+    :param time_series: DataFrame, combined time series frame
+    :return: dict
+    """
+    country = params.get("country") or None
+    n = _positive_int(params, "n", 10)
+    routes = {
+        "/{}/version".format(API_VERSION): lambda: {},
+        "/{}/snapshot".format(API_VERSION): lambda: metrics.snapshot_totals(report, country),
+        "/{}/top".format(API_VERSION): lambda: (metrics.top_provinces(report, country, n) if country
+                                                else metrics.top_countries(report, n)),
+        "/{}/timeline".format(API_VERSION): lambda: _timeline(time_series, params.get("feature", "Confirmed"),
+                                                              country),
+        "/{}/analytics".format(API_VERSION): lambda: _analytics(time_series, params.get("analytic", "average"),
+                                                                params.get("feature", "Confirmed"), country),
+        "/{}/compare".format(API_VERSION): lambda: _compare(time_series, params),
+        "/{}/day_change".format(API_VERSION): lambda: metrics.day_change(time_series, country,
+                                                                      _date(params, "date")),
+        "/{}/provinces".format(API_VERSION): lambda: metrics.province_totals(report, country),
+        "/{}/headline".format(API_VERSION): lambda: metrics.headline_stats(report),
+        "/{}/selection".format(API_VERSION): lambda: _selection(report, time_series, country, n),
+    }
+    if path not in routes:
+        raise NotFound(path)
+    try:
+        data = routes[path]()
+    except KeyError as e:
+        raise NotFound("Unknown value {}".format(e))
+
+    return {"report_version": data_version(report), "time_series_version": data_version(time_series),
+            "data": _plain(data)}
+
+
+@traced("api.respond")
+def respond(path, params, report, time_series):
+    """
+    Function returns the serialized response of a route and its ETag. Bodies are cached per
+    data version, so each aggregate is computed and encoded once per version, not once per viewer.
+
+    :param path: str
+    :param params: dict
+    :param report: DataFrame
+    :param time_series: DataFrame
+    :return: (bytes, str)
+    """
+    key = ("api", data_version(report), data_version(time_series), path, tuple(sorted(params.items())))
+    found, cached = figure_cache.get(key)
+    if found:
+        return cached
+    body = json.dumps(aggregate(path, params, report, time_series), separators=(",", ":")).encode()
+    etag = '"{}"'.format(hashlib.sha1(repr(key).encode()).hexdigest())
+    figure_cache.put(key, (body, etag), size=len(body))
+
+    return body, etag
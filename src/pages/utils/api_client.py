@@ -0,0 +1,154 @@
+import json
+import os
+from urllib.parse import urlencode
+
+import pandas as pd
+from requests import RequestException
+from src.pages.utils import metrics
+from src.pages.utils.data_version import data_version
+from src.pages.utils.fetcher import get_fetcher
+
+# Base url of a running `python serve.py`, e.g. http://127.0.0.1:8502. Empty computes locally.
+API_URL = os.environ.get("COVID_API_URL", "").rstrip("/")
+
+
+def _get(path, df, **params):
+    """
+    Function fetches an aggregate from the API server. Returns None, so that the caller computes it
+    locally, when no server is configured, it is unreachable or it serves a different data version.
+
+    :param path: str, route such as "snapshot"
+    :param df: DataFrame, the frame the caller would have aggregated
+    :param params: query parameters, None values are dropped
+    :return: object or None
+    """
+    if not API_URL:
+        return None
+    query = urlencode({key: value for key, value in params.items() if value is not None})
+    url = "{}/v1/{}?{}".format(API_URL, path, query)
+    try:
+        payload = json.loads(get_fetcher().fetch(url).content)
+    except (RequestException, OSError, ValueError):
+        return None
+    if data_version(df) not in (payload["report_version"], payload["time_series_version"]):
+        return None
+
+    return payload["data"]
+
+
+def snapshot_totals(df, country=None):
+    """
+    Function returns the total of every report metric, worldwide or for one country, see
+    metrics.snapshot_totals.
+
+    :param df: DataFrame, daily report
+    :param country: str
+    :return: Series indexed by metric
+    """
+    data = _get("snapshot", df, country=country)
+
+    return metrics.snapshot_totals(df, country) if data is None else pd.Series(data)
+
+
+def top_countries(df, n=10):
+    """
+    Function returns the n leading countries of every metric, see metrics.top_countries.
+
+    :param df: DataFrame, daily report
+    :param n: int
+    :return: dict of metric -> Series, largest first
+    """
+    data = _get("top", df, n=n)
+    if data is None:
+        return metrics.top_countries(df, n)
+
+    return {metric: pd.Series(values) for metric, values in data.items()}
+
+
+def top_provinces(df, country, n=10):
+    """
+    Function returns the n leading provinces of a country for every metric, see
+    metrics.top_provinces.
+
+    :param df: DataFrame, daily report
+    :param country: str
+    :param n: int
+    :return: dict of metric -> Series, largest first
+    """
+    data = _get("top", df, country=country, n=n)
+    if data is None:
+        return metrics.top_provinces(df, country, n)
+
+    return {metric: pd.Series(values) for metric, values in data.items()}
+
+
+def timeline(time_series, feature, country=None):
+    """
+    Function returns the cumulative series of a metric and its daily delta, see metrics.timeline.
+
+    :param time_series: DataFrame, combined time series frame
+    :param feature: str
+    :param country: str, worldwide when None
+    :return: DataFrame with Date, feature and Delta_feature columns
+    """
+    data = _get("timeline", time_series, feature=feature, country=country)
+    if data is None:
+        return metrics.timeline(time_series, feature, country)
+
+    return pd.DataFrame({"Date": pd.to_datetime(data["dates"]), feature: data["values"],
+                         "Delta_{}".format(feature): data["deltas"]})
+
+
+def analytics_timeline(time_series, analytic, feature, country=None):
+    """
+    Function returns a rolling analytic of a metric, see metrics.analytics_timeline.
+
+    :param time_series: DataFrame, combined time series frame
+    :param analytic: str, one of rolling_analytics.ANALYTICS
+    :param feature: str
+    :param country: str, worldwide when None
+    :return: DataFrame with Date and analytic columns
+    """
+    data = _get("analytics", time_series, analytic=analytic, feature=feature, country=country)
+    if data is None:
+        return metrics.analytics_timeline(time_series, analytic, feature, country)
+
+    return pd.DataFrame({"Date": pd.to_datetime(data["dates"]), analytic: data["values"]})
+
+
+def compare(time_series, feature, countries, start=None, end=None, view="cumulative"):
+    """
+    Function returns the series of several countries side by side, see metrics.compare.
+
+    :param time_series: DataFrame, combined time series frame
+    :param feature: str
+    :param countries: list of str
+    :param start: date-like, from the first date when None
+    :param end: date-like, to the last date when None
+    :param view: str, "cumulative", "daily" or one of rolling_analytics.ANALYTICS
+    :return: DataFrame with a Date column and one column per country
+    """
+    data = _get("compare", time_series, feature=feature, countries="|".join(countries), view=view,
+                start=start and pd.Timestamp(start).strftime("%Y-%m-%d"),
+                end=end and pd.Timestamp(end).strftime("%Y-%m-%d"))
+    if data is None:
+        return metrics.compare(time_series, feature, countries, start, end, view)
+    frame = pd.DataFrame(data["values"], columns=list(countries), dtype="float64")
+    frame.insert(0, "Date", pd.to_datetime(data["dates"]))
+
+    return frame
+
+
+def day_change(time_series, country=None, date=None):
+    """
+    Function returns the change of every metric, including active cases, over one day, see
+    metrics.day_change.
+
+    :param time_series: DataFrame, combined time series frame
+    :param country: str
+    :param date: date-like, the day ending the change, the most recent one when None
+    :return: Series or dict of metric -> int
+    """
+    data = _get("day_change", time_series, country=country, date=date and pd.Timestamp(date).strftime("%Y-%m-%d"))
+
+    return metrics.day_change(time_series, country, date) if data is None else pd.Series(data)
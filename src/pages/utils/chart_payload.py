@@ -0,0 +1,147 @@
+import os
+import weakref
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from src.pages.utils.tracing import traced
+
+# Width in pixels of a chart in the main column. A line cannot show more points than it has
+# pixels, so series longer than this are downsampled to one point per pixel.
+CHART_WIDTH = int(os.environ.get("COVID_CHART_WIDTH", 700))
+SIGNIFICANT_DIGITS = 4
+# Decimals shown by the hover templates, which rounding must not go below.
+HOVER_DECIMALS = 2
+DOWNSAMPLED_TYPES = ("scatter", "scattergl", "bar")
+
+# id(figure) -> max_points -> compacted figure, dropped when the figure is garbage collected
+_compacted = {}
+
+
+def lttb(x, y, threshold):
+    """
+    Function picks the points of a series to keep with Largest-Triangle-Three-Buckets: the series is
+    split into threshold - 2 buckets and from each one the point forming the largest triangle with
+    the previously kept point and the average of the next bucket is kept, which preserves peaks
+    and turns that plain striding would drop.
+
+    :param x: numpy.ndarray of float
+    :param y: numpy.ndarray of float
+    :param threshold: int, number of points to keep
+    :return: numpy.ndarray of int, positions of the kept points in ascending order
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = np.nan_to_num(y)
+    edges = np.linspace(1, n - 1, threshold - 1).astype("int64")
+    edges = np.append(edges, n)
+    kept = np.empty(threshold, dtype="int64")
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_x = x[stop:edges[i + 2]].mean()
+        next_y = y[stop:edges[i + 2]].mean()
+        area = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        kept[i + 1] = previous
+
+    return kept
+
+
+def compact_values(values):
+    """
+    Function encodes trace data in its shortest exact form: integral floats as integers (with nulls
+    where a count is missing, e.g. the first daily change), other floats rounded to
+    SIGNIFICANT_DIGITS but never to fewer than HOVER_DECIMALS decimals, and midnight timestamps as
+    plain dates.
+
+    :param values: array-like
+    :return: numpy.ndarray
+    """
+    values = np.asarray(values)
+    dates = _dates(values)
+    if dates is not None:
+        if (dates == dates.normalize()).all():
+            return dates.strftime("%Y-%m-%d").to_numpy()
+        return values
+    if values.dtype.kind != "f":
+        return values
+    finite = np.isfinite(values)
+    integral = finite & (values == np.round(values))
+    if integral.all():
+        return values.astype("int32" if np.abs(values).max(initial=0) < 2 ** 31 else "int64")
+    if (integral | np.isnan(values)).all():
+        return np.array([int(value) if exact else None for value, exact in zip(values, integral)], dtype=object)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        magnitude = np.floor(np.log10(np.abs(values)))
+    decimals = np.maximum(SIGNIFICANT_DIGITS - 1 - np.where(finite & (values != 0), magnitude, 0), HOVER_DECIMALS)
+    scale = np.power(10.0, decimals)
+
+    return np.where(integral, values, np.round(values * scale) / scale)
+
+
+def _dates(values):
+    """
+    Function reads trace data holding dates, either datetime64 arrays or object arrays of datetime
+    objects (as plotly 4 stores pandas date columns).
+
+    :param values: numpy.ndarray
+    :return: DatetimeIndex, None when values are not dates
+    """
+    if values.dtype.kind == "M":
+        return pd.DatetimeIndex(values)
+    if values.dtype.kind == "O" and values.size and isinstance(values.flat[0], (date, np.datetime64)):
+        return pd.DatetimeIndex(pd.to_datetime(values))
+    return None
+
+
+def _positions(values):
+    """
+    Function returns the numeric positions LTTB measures a trace by.
+
+    :param values: array-like
+    :return: numpy.ndarray of float64, None for categorical data, which is not downsampled
+    """
+    values = np.asarray(values)
+    dates = _dates(values)
+    if dates is not None:
+        return dates.asi8.astype("float64")
+    if values.dtype.kind in "biuf":
+        return values.astype("float64")
+    return None
+
+
+@traced("render.compact_figure")
+def compact_figure(fig, max_points=CHART_WIDTH):
+    """
+    Function returns a copy of a figure whose line and bar traces are downsampled to max_points
+    and whose trace data is compactly encoded. Figures are compacted at most once per object.
+
+    :param fig: plotly.figure
+    :param max_points: int, None only compacts the encoding and keeps every point
+    :return: plotly.figure
+    """
+    cache = _compacted.get(id(fig))
+    if cache is None:
+        cache = _compacted[id(fig)] = {}
+        weakref.finalize(fig, _compacted.pop, id(fig), None)
+    if max_points in cache:
+        return cache[max_points]
+    compact = go.Figure(fig)
+    for trace in compact.data:
+        x, y = getattr(trace, "x", None), getattr(trace, "y", None)
+        if x is None or y is None:
+            continue
+        if max_points is not None and trace.type in DOWNSAMPLED_TYPES and len(x) > max_points:
+            x_positions, y_positions = _positions(x), _positions(y)
+            if x_positions is not None and y_positions is not None:
+                kept = lttb(x_positions, y_positions, max_points)
+                x, y = np.asarray(x)[kept], np.asarray(y)[kept]
+        trace.x, trace.y = compact_values(x), compact_values(y)
+    cache[max_points] = compact
+
+    return compact
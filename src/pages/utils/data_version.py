@@ -0,0 +1,26 @@
+def stamp_version(df, version):
+    """
+    Function tags a dataset with the version of the data it was built from.
+
+    :param df: DataFrame
+    :param version: str
+    :return: DataFrame
+    """
+    df.attrs["data_version"] = version
+
+    return df
+
+
+def data_version(df):
+    """
+    Function returns the data version of a dataset in O(1). Frames that were not stamped by a
+    loader fall back to a version derived from their shape.
+
+    :param df: DataFrame
+    :return: str
+    """
+    version = getattr(df, "attrs", {}).get("data_version")
+    if version is None:
+        version = "unversioned-{}-{}x{}".format(id(df), *df.shape)
+
+    return version
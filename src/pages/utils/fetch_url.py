@@ -1,3 +1,5 @@
+from src.pages.utils.snapshot_store import source_url
+
 
 def fetch_url(date, country=None):
     """
@@ -7,10 +9,7 @@ def fetch_url(date, country=None):
     :param country: str
     :return: str
     """
-    DATA_URL = ("https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/"
-                "csse_covid_19_daily_reports/{}.csv".format(date.date().strftime("%m-%d-%Y")))
     if country == "US":
-        DATA_URL = ("https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/"
-                    "csse_covid_19_daily_reports_us/{}.csv".format(date.date().strftime("%m-%d-%Y")))
+        return source_url("us", date)
 
-    return DATA_URL
+    return source_url("global", date)
@@ -0,0 +1,196 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+
+import requests
+from requests.adapters import HTTPAdapter
+from src.pages.utils.tracing import traced, tracer
+
+MAX_WORKERS = int(os.environ.get("COVID_FETCH_WORKERS", 8))
+TIMEOUT = 30
+# Bodies kept for conditional GETs, least recently used first out, and urls with per url stats.
+CACHE_BYTES = int(os.environ.get("COVID_FETCH_CACHE_MB", 256)) * 2 ** 20
+MAX_TRACKED_URLS = 1024
+
+# content: bytes
+# modified: bool, False when the source answered 304 (or the local file is unchanged)
+FetchResult = namedtuple("FetchResult", ["url", "content", "modified", "status", "latency", "size"])
+
+
+class Fetcher:
+    """
+    Shared download layer. Requests go over one pooled keep-alive session, independent files are
+    fetched concurrently and every url is revalidated with ETag/If-Modified-Since so an unchanged
+    file costs a 304 rather than a full transfer. Plain paths are read from disk, using the file's
+    mtime as the validator, so a local directory can stand in for GitHub. Kept bodies are bounded
+    by cache_bytes and per url stats by MAX_TRACKED_URLS, so many distinct urls (API queries) do
+    not grow memory without bound.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, cache_bytes=CACHE_BYTES):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        self.cache_bytes = cache_bytes
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._stats = OrderedDict()
+        self._totals = {"requests": 0, "not_modified": 0, "bytes": 0}
+        self._lock = threading.Lock()
+
+    @traced("load.fetch")
+    def fetch(self, url, revalidate=True):
+        """
+        Function downloads a url, revalidating any copy fetched before.
+        Raises FileNotFoundError when the source does not have the file (HTTP 404).
+
+        :param url: str, http(s) url or local path
+        :param revalidate: bool, keep the body so the next fetch can be conditional. Files that are
+                           only ever read once (daily reports) should pass False.
+        :return: FetchResult
+        """
+        start = time.perf_counter()
+        with self._lock:
+            cached = self._cache.get(url)
+            if cached is not None:
+                self._cache.move_to_end(url)
+        if url.startswith(("http://", "https://")):
+            content, validators, status = self._fetch_http(url, cached)
+        else:
+            content, validators, status = self._fetch_file(url, cached)
+        modified = status != 304
+        if not modified:
+            content = cached[0]
+        latency = time.perf_counter() - start
+        size = len(content) if modified else 0
+        tracer.observe_size("download", size)
+        tracer.count("fetch.not_modified" if not modified else "fetch.downloaded")
+        with self._lock:
+            if modified and revalidate:
+                self._keep(url, content, validators)
+            stats = self._stats.pop(url, None) or {"requests": 0, "not_modified": 0, "bytes": 0}
+            self._stats[url] = stats
+            while len(self._stats) > MAX_TRACKED_URLS:
+                self._stats.popitem(last=False)
+            for totals in (stats, self._totals):
+                totals["requests"] += 1
+                totals["not_modified"] += int(not modified)
+                totals["bytes"] += size
+            stats.update(status=status, latency=latency, last_bytes=size)
+
+        return FetchResult(url, content, modified, status, latency, size)
+
+    def _keep(self, url, content, validators):
+        previous = self._cache.pop(url, None)
+        if previous is not None:
+            self._cached_bytes -= len(previous[0])
+        if len(content) > self.cache_bytes:
+            return
+        self._cache[url] = (content, validators)
+        self._cached_bytes += len(content)
+        while self._cached_bytes > self.cache_bytes:
+            _, (evicted, _) = self._cache.popitem(last=False)
+            self._cached_bytes -= len(evicted)
+
+    def _fetch_http(self, url, cached):
+        headers = {}
+        if cached is not None:
+            etag, last_modified = cached[1]
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        response = self.session.get(url, headers=headers, timeout=TIMEOUT)
+        if response.status_code == 404:
+            raise FileNotFoundError(url)
+        if response.status_code == 304:
+            return None, None, 304
+        response.raise_for_status()
+
+        return response.content, (response.headers.get("ETag"), response.headers.get("Last-Modified")), 200
+
+    def _fetch_file(self, path, cached):
+        stat = os.stat(path)
+        validators = (str(stat.st_size), formatdate(stat.st_mtime, usegmt=True))
+        if cached is not None and cached[1] == validators:
+            return None, None, 304
+        with open(path, "rb") as f:
+            return f.read(), validators, 200
+
+    def exists(self, url):
+        """
+        Function tells whether the source has a file without downloading it.
+
+        :param url: str, http(s) url or local path
+        :return: bool
+        """
+        if not url.startswith(("http://", "https://")):
+            return os.path.isfile(url)
+        response = self.session.head(url, timeout=TIMEOUT, allow_redirects=True)
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+
+        return True
+
+    def fetch_many(self, urls):
+        """
+        Function downloads several urls concurrently.
+
+        :param urls: list of str
+        :return: dict of url -> FetchResult
+        """
+        return dict(zip(urls, self.executor.map(self.fetch, urls)))
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Function runs a call on the fetch pool without blocking the caller.
+
+        :param fn: callable
+        :return: concurrent.futures.Future
+        """
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def totals(self):
+        """
+        Function returns request counts and bytes summed over every url, including urls whose
+        own stats were dropped, and the bytes currently kept for revalidation.
+
+        :return: dict
+        """
+        with self._lock:
+            return dict(self._totals, cached_bytes=self._cached_bytes)
+
+    def stats(self):
+        """
+        Function returns per url request counts, bytes transferred and the latency of the last request,
+        for the MAX_TRACKED_URLS most recently fetched urls.
+
+        :return: dict
+        """
+        with self._lock:
+            return {url: dict(stats) for url, stats in self._stats.items()}
+
+
+_FETCHER = None
+_FETCHER_LOCK = threading.Lock()
+
+
+def get_fetcher():
+    """
+    Function returns the process wide Fetcher.
+
+    :return: Fetcher
+    """
+    global _FETCHER
+    with _FETCHER_LOCK:
+        if _FETCHER is None:
+            _FETCHER = Fetcher()
+            tracer.register_collector("fetcher", _FETCHER.totals)
+
+    return _FETCHER
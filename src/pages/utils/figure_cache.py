@@ -0,0 +1,184 @@
+import functools
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from src.pages.utils.data_version import data_version
+from src.pages.utils.tracing import tracer
+
+FIGURE_CACHE_BUDGET = int(os.environ.get("COVID_FIGURE_CACHE_MB", 256)) * 1024 * 1024
+# Trace and marker properties holding per point data, which is where a figure's size is.
+TRACE_ARRAYS = ("x", "y", "z", "lat", "lon", "text", "hovertext", "customdata", "ids", "labels", "values",
+                "locations")
+MARKER_ARRAYS = ("size", "color")
+# Layout, template and trace attributes of a figure, roughly constant.
+FIGURE_OVERHEAD = 16 * 1024
+
+
+def _array_size(value):
+    """
+    Function estimates the size of a trace array from its length and first item, without
+    walking or serializing it.
+
+    :param value: numpy.ndarray, tuple, list, scalar or None
+    :return: int, bytes
+    """
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind != "O":
+            return value.nbytes
+        return value.size * _array_size(value.flat[0]) if value.size else 0
+    if isinstance(value, (tuple, list)):
+        return len(value) * _array_size(value[0]) if value else 0
+    if isinstance(value, str):
+        return len(value) + 2
+
+    return 8 if value is not None else 0
+
+
+def figure_size(fig):
+    """
+    Function estimates the memory held by a figure from its per point arrays, in time independent
+    of the number of points. Serializing it just to measure it would cost about as much as
+    building it.
+
+    :param fig: plotly.figure
+    :return: int, bytes
+    """
+    size = FIGURE_OVERHEAD
+    for trace in fig.data:
+        size += sum(_array_size(getattr(trace, name, None)) for name in TRACE_ARRAYS if name in trace)
+        if "marker" in trace:
+            size += sum(_array_size(getattr(trace.marker, name, None)) for name in MARKER_ARRAYS)
+
+    return size
+
+
+def estimate_size(value):
+    """
+    Function estimates the memory held by a cached result. Figures are measured by the arrays
+    they carry, which is what they cost to keep and to ship.
+
+    :param value: object
+    :return: int, bytes
+    """
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_size(item) for item in value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if hasattr(value, "data") and hasattr(value, "layout"):
+        return figure_size(value)
+
+    return sys.getsizeof(value)
+
+
+class FigureCache:
+    """
+    LRU cache of figures and results keyed on (data version, function, arguments), evicting the
+    least recently used entries once the estimated size exceeds the memory budget.
+    """
+
+    def __init__(self, budget=FIGURE_CACHE_BUDGET):
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Function looks up a key, marking it most recently used.
+
+        :param key: tuple
+        :return: (bool, object), whether the key was found and its value
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, self._entries[key][0]
+
+    def put(self, key, value, size=None):
+        """
+        Function stores a value and evicts least recently used entries until the cache fits its budget.
+
+        :param key: tuple
+        :param value: object
+        :param size: int, bytes, estimated when omitted
+        :return: None
+        """
+        size = estimate_size(value) if size is None else size
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.budget and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Function drops every entry.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Function returns the cache counters.
+
+        :return: dict
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "bytes": self.size, "budget": self.budget}
+
+
+figure_cache = FigureCache()
+tracer.register_collector("figure_cache", figure_cache.stats)
+
+
+def _freeze(value):
+    if isinstance(value, pd.DataFrame):
+        return data_version(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    # Array-backed datasets (TimeSeriesCube, CountySeries) are keyed by their data version too.
+    if isinstance(getattr(value, "version", None), str):
+        return value.version
+
+    return value
+
+
+def cached(func):
+    """
+    Decorator caching a function's result in figure_cache. DataFrame arguments contribute their
+    data version to the key instead of being hashed, so a hit costs a dictionary lookup.
+
+    :param func: callable
+    :return: callable
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__module__, func.__name__, _freeze(args), _freeze(kwargs))
+        found, value = figure_cache.get(key)
+        tracer.count("cache.hit" if found else "cache.miss", func.__name__)
+        if not found:
+            value = func(*args, **kwargs)
+            figure_cache.put(key, value)
+        return value
+
+    return wrapper
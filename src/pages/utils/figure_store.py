@@ -0,0 +1,233 @@
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly.graph_objects as go
+import plotly.io as pio
+from src.pages.utils.data_version import data_version
+from src.pages.utils.figure_cache import figure_cache
+from src.pages.utils.geo_layer import mapbox_token
+from src.pages.utils.shared_dataset import KEEP_VERSIONS, build_lock
+from src.pages.utils.snapshot_store import PATH
+from src.pages.utils.tracing import set_payload_size, traced, tracer
+
+FIGURE_STORE_PATH = os.environ.get("COVID_FIGURE_STORE", os.path.join(PATH, "data", "figures"))
+# Warm-up runs next to the page workers and the report ingest pool, so by default it takes at most
+# two cores.
+WARM_UP_PROCESSES = int(os.environ.get("COVID_WARM_UP_PROCESSES", max(1, min(2, (os.cpu_count() or 2) // 2))))
+FEATURES = ["Confirmed", "Deaths", "Recovered"]
+_COMPLETE = "_complete"
+
+
+def _slug(value):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", str(value)) if value is not None else "_all"
+
+
+def figure_path(version, view, country=None, feature=None):
+    """
+    Function returns the store path of a pre-rendered figure.
+
+    :param version: str, data version of the frame the figure was built from
+    :param view: str
+    :param country: str
+    :param feature: str
+    :return: str
+    """
+    return os.path.join(FIGURE_STORE_PATH, _slug(version), view, _slug(country), "{}.json".format(_slug(feature)))
+
+
+def load_figure(version, view, country=None, feature=None):
+    """
+    Function reads a pre-rendered figure from the store, setting the mapbox access token of map
+    figures again.
+
+    :return: plotly.figure or None if it has not been rendered
+    """
+    path = figure_path(version, view, country, feature)
+    try:
+        with open(path) as f:
+            text = f.read()
+        fig = pio.from_json(text)
+        if "mapbox" in fig.layout and fig.layout.mapbox.style is not None:
+            fig.update_layout(mapbox_accesstoken=mapbox_token())
+    except (OSError, ValueError):
+        return None
+    set_payload_size(fig, len(text))
+
+    return fig
+
+
+def save_figure(fig, version, view, country=None, feature=None):
+    """
+    Function writes a figure to the store atomically. The mapbox access token is left out, so the
+    secret is not written to disk.
+
+    :return: str, path of the stored figure
+    """
+    if "mapbox" in fig.layout and fig.layout.mapbox.accesstoken is not None:
+        fig = go.Figure(fig)
+        fig.update_layout(mapbox_accesstoken=None)
+    path = figure_path(version, view, country, feature)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "w") as f:
+        f.write(fig.to_json())
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def stored_figure(view, df, render, country=None, feature=None):
+    """
+    Function serves a figure from the store, rendering it when it has not been pre-rendered.
+    Loaded figures are kept in figure_cache, so a rerun reuses the same object (and its compacted
+    copy) instead of parsing the file again.
+
+    :param view: str
+    :param df: DataFrame the figure is built from
+    :param render: callable returning the figure
+    :param country: str
+    :param feature: str
+    :return: plotly.figure
+    """
+    key = ("figure_store", data_version(df), view, country, feature)
+    found, fig = figure_cache.get(key)
+    if found:
+        tracer.count("figure_store.memo", view)
+        return fig
+    with tracer.span("render.figure_store_load"):
+        fig = load_figure(data_version(df), view, country, feature)
+    tracer.count("figure_store.hit" if fig is not None else "figure_store.miss", view)
+    if fig is None:
+        return render()
+    figure_cache.put(key, fig)
+
+    return fig
+
+
+_worker_data = {}
+
+
+def _init_worker(report, time_series):
+    pio.templates.default = "plotly_dark"
+    _worker_data["report"] = report
+    _worker_data["time_series"] = time_series
+
+
+def _render_country(country):
+    # Imported here so the parent process does not need the page module loaded to schedule work.
+    from src.pages import dashboard
+
+    report = _worker_data["report"]
+    time_series = _worker_data["time_series"]
+    renders = [("snapshot", report, None, lambda: dashboard.plot_snapshot_numbers(report, None, None, country)),
+               ("province", report, None, lambda: dashboard.plot_province(report, country))]
+    if country != "US":
+        renders.append(("province_drilled", report, None, lambda: dashboard.plot_province_drilled(report, country)))
+    for feature in FEATURES:
+        renders.append(("timeline", time_series, feature,
+                        lambda feature=feature: dashboard.plot_timeline(time_series, feature, country=country)[0]))
+    written = 0
+    for view, df, feature, render in renders:
+        try:
+            fig = render()
+        except Exception:
+            continue
+        if fig is not None:
+            save_figure(fig, data_version(df), view, country, feature)
+            written += 1
+
+    return written
+
+
+@traced("render.warm_up")
+def warm_up(report, time_series, countries=None, processes=WARM_UP_PROCESSES):
+    """
+    Function pre-renders every Country view for every country into the store, spreading the
+    countries over a process pool.
+
+    :param report: DataFrame, daily report
+    :param time_series: DataFrame, combined time series frame
+    :param countries: list, defaults to every country in the report
+    :param processes: int
+    :return: int, number of figures written
+    """
+    if countries is None:
+        countries = [country for country in report["Country_Region"].unique() if country == country]
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_init_worker,
+                             initargs=(report, time_series)) as executor:
+        written = sum(executor.map(_render_country, countries))
+    for df in (report, time_series):
+        folder = os.path.join(FIGURE_STORE_PATH, _slug(data_version(df)))
+        os.makedirs(folder, exist_ok=True)
+        open(os.path.join(folder, _COMPLETE), "a").close()
+
+    return written
+
+
+def is_warm(df):
+    """
+    Function tells whether every figure for a data version has been rendered.
+
+    :param df: DataFrame
+    :return: bool
+    """
+    return os.path.exists(os.path.join(FIGURE_STORE_PATH, _slug(data_version(df)), _COMPLETE))
+
+
+def prune(keep):
+    """
+    Function removes the figures of every data version except those in keep and the
+    2 * KEEP_VERSIONS most recently rendered ones (a report and a time series version each),
+    which workers that have not yet moved to the new data may still be serving.
+
+    :param keep: iterable of str, data versions
+    :return: None
+    """
+    keep = {_slug(version) for version in keep}
+    try:
+        folders = [os.path.join(FIGURE_STORE_PATH, name) for name in os.listdir(FIGURE_STORE_PATH)
+                   if name not in keep and os.path.isdir(os.path.join(FIGURE_STORE_PATH, name))]
+    except FileNotFoundError:
+        return
+    folders.sort(key=os.path.getmtime, reverse=True)
+    for folder in folders[max(0, 2 * KEEP_VERSIONS - len(keep)):]:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def _warm_up_once(report, time_series):
+    # Every Streamlit worker schedules the same warm-up; the lock lets one of them render while the
+    # others wait and then find the version complete.
+    with build_lock("figures"):
+        if is_warm(report) and is_warm(time_series):
+            return
+        warm_up(report, time_series)
+        prune([data_version(report), data_version(time_series)])
+
+
+_scheduled = set()
+_scheduled_lock = threading.Lock()
+
+
+def ensure_warm(report, time_series):
+    """
+    Function starts a background warm-up the first time a new data version is seen. Warm-ups are
+    serialized across processes, so a version is rendered by one worker only, and older versions
+    are pruned from the store once it is complete.
+
+    :param report: DataFrame
+    :param time_series: DataFrame
+    :return: None
+    """
+    key = (data_version(report), data_version(time_series))
+    with _scheduled_lock:
+        if key in _scheduled or (is_warm(report) and is_warm(time_series)):
+            return
+        _scheduled.add(key)
+    thread = threading.Thread(target=_warm_up_once, args=(report, time_series), name="figure-warm-up",
+                              daemon=True)
+    thread.start()
@@ -0,0 +1,126 @@
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+from src.pages.utils.data_version import data_version, stamp_version
+from src.pages.utils.figure_cache import cached
+from src.pages.utils.load_data import country_slice
+from src.pages.utils.snapshot_store import PATH
+from src.pages.utils.tracing import traced
+
+MAX_MAP_POINTS = int(os.environ.get("COVID_MAP_MAX_POINTS", 1000))
+# Grid cell size, in degrees, at zoom level 0. Every zoom level halves it, like map tiles.
+BASE_CELL_DEGREES = 16.0
+COUNT_COLUMNS = ["Confirmed", "Deaths", "Recovered"]
+
+
+@functools.lru_cache(maxsize=None)
+def mapbox_token():
+    """
+    Function reads the mapbox access token once per process.
+
+    :return: str
+    """
+    with open(os.path.join(PATH, "src/pages/utils/tokens/.mapbox_token")) as tfile:
+        return tfile.read().strip()
+
+
+def _labels(values):
+    return pd.Series(values, dtype=object).fillna("Not Available").to_numpy()
+
+
+@traced("aggregate.prepare_geo")
+@cached
+def prepare_geo(df, country):
+    """
+    Function prepares the map points of a country: one row per located report entry with
+    readable labels and the log scaled confirmed count used as marker size.
+
+    :param df: DataFrame, daily report
+    :param country: str
+    :return: DataFrame or None if the country has no province/state level information
+    """
+    source = country_slice(df, country)
+    if len(source) == 0 or source["Province_State"].isnull().all():
+        return None
+    lat = source["Lat"].to_numpy(dtype="float64")
+    lon = source["Long_"].to_numpy(dtype="float64")
+    located = ~(np.isnan(lat) | np.isnan(lon))
+    confirmed = source["Confirmed"].to_numpy(dtype="float64")[located]
+    geo = pd.DataFrame({
+        "lat": lat[located],
+        "lon": lon[located],
+        "City": _labels(source["Admin2"].to_numpy()[located] if "Admin2" in source else [None] * located.sum()),
+        "Province_State": _labels(source["Province_State"].to_numpy()[located]),
+        "Combined_Key": _labels(source["Combined_Key"].to_numpy()[located]),
+        "Confirmed": confirmed,
+        "Deaths": source["Deaths"].to_numpy(dtype="float64")[located],
+        "Recovered": source["Recovered"].to_numpy(dtype="float64")[located],
+        "Incident_Rate": source["Incident_Rate"].to_numpy(dtype="float64")[located],
+        # Same as log(Confirmed) with -inf (no cases) shown as 0.
+        "Scaled Confirmed": np.log(np.maximum(confirmed, 1)),
+    })
+
+    return stamp_version(geo, "{}-geo-{}".format(data_version(df), country))
+
+
+def bin_points(geo, cell):
+    """
+    Function aggregates map points into a square grid. Each cell is placed at the case weighted
+    centre of its points and labelled after its largest point.
+
+    :param geo: DataFrame from prepare_geo
+    :param cell: float, cell size in degrees
+    :return: DataFrame with the same columns as geo
+    """
+    geo = geo.sort_values("Confirmed", ascending=False, kind="mergesort")
+    keys = np.floor(geo["lat"].to_numpy() / cell) * 100000 + np.floor(geo["lon"].to_numpy() / cell)
+    codes, _ = pd.factorize(keys)
+    weights = np.maximum(geo["Confirmed"].to_numpy(), 1)
+
+    def weighted(values):
+        return np.bincount(codes, weights=values * weights) / np.bincount(codes, weights=weights)
+
+    size = np.bincount(codes)
+    largest = pd.Series(np.arange(len(codes))).groupby(codes).first().to_numpy()
+    binned = pd.DataFrame({
+        "lat": weighted(geo["lat"].to_numpy()),
+        "lon": weighted(geo["lon"].to_numpy()),
+        "City": np.where(size > 1, pd.Series(size).map("{} locations".format).to_numpy(),
+                         geo["City"].to_numpy()[largest]),
+        "Province_State": geo["Province_State"].to_numpy()[largest],
+        "Combined_Key": np.where(size > 1,
+                                 pd.Series(geo["Combined_Key"].to_numpy()[largest]).str.cat(
+                                     pd.Series(size - 1).map(" and {} more".format)).to_numpy(),
+                                 geo["Combined_Key"].to_numpy()[largest]),
+    })
+    for column in COUNT_COLUMNS:
+        binned[column] = np.bincount(codes, weights=np.nan_to_num(geo[column].to_numpy()))
+    binned["Incident_Rate"] = weighted(np.nan_to_num(geo["Incident_Rate"].to_numpy()))
+    binned["Scaled Confirmed"] = np.log(np.maximum(binned["Confirmed"].to_numpy(), 1))
+
+    return binned
+
+
+@traced("aggregate.level_of_detail")
+@cached
+def level_of_detail(geo, zoom, max_points=MAX_MAP_POINTS):
+    """
+    Function bounds the number of map points for a zoom level, binning them on a grid that gets
+    coarser until at most max_points remain.
+
+    :param geo: DataFrame from prepare_geo
+    :param zoom: int, map zoom level the points are prepared for
+    :param max_points: int
+    :return: DataFrame
+    """
+    if len(geo) <= max_points:
+        return geo
+    cell = BASE_CELL_DEGREES / 2 ** zoom
+    binned = bin_points(geo, cell)
+    while len(binned) > max_points:
+        cell *= 2
+        binned = bin_points(geo, cell)
+
+    return binned
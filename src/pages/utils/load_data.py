@@ -1,15 +1,92 @@
+import hashlib
+import os
+
+import numpy as np
 import pandas as pd
-import streamlit as st
+from src.pages.utils.data_version import stamp_version
+from src.pages.utils.figure_cache import cached
+from src.pages.utils.shared_dataset import attach, publish
+from src.pages.utils.snapshot_store import (compact_report, ingest_report, parse_report_url, read_report,
+                                            sort_by_country)
+from src.pages.utils.tracing import traced
+
+# Columns each view reads from a daily report. None reads every column.
+VIEW_COLUMNS = {
+    "data": None,
+    "dashboard": ["Admin2", "Province_State", "Country_Region", "Combined_Key", "Lat", "Long_",
+                  "Confirmed", "Deaths", "Recovered", "Active", "Incident_Rate"],
+    "totals": ["Province_State", "Country_Region", "Confirmed", "Deaths", "Recovered", "Active"],
+}
+SHARED_NAME = "reports"
+# Report projections kept in the shared dataset store, least recently used first out. Every
+# date browsed on the report slider adds up to one per view.
+SHARED_REPORTS = int(os.environ.get("COVID_SHARED_REPORTS", 64))
+
 
-@st.cache
-def load_data(DATA_URL, nrows=None):
+@traced("load.load_data")
+@cached
+def load_data(DATA_URL, nrows=None, columns=None):
     """
-    Function reads data from the url and returns a dataframe
+    Function reads data from the url and returns a dataframe.
+    Daily reports are served from the local snapshot store, ingesting them on first use, and
+    come back sorted by country (see country_slice). Each projection of a report is published
+    once to the shared dataset store, so worker processes attach to it rather than each reading
+    their own copy.
 
     :param DATA_URL: str
     :param nrows: int
+    :param columns: list, optional column projection, e.g. VIEW_COLUMNS["dashboard"]
+    :return: DataFrame
+    """
+    report = parse_report_url(DATA_URL)
+    if report is None:
+        version = "url-{}".format(DATA_URL)
+    else:
+        kind, date = report
+        version = "report-{}-{}".format(kind, date.strftime("%Y-%m-%d"))
+    if columns is not None:
+        version += "-columns-{}".format(hashlib.md5(",".join(columns).encode()).hexdigest()[:8])
+    if nrows is not None:
+        version += "-rows-{}".format(nrows)
+    if report is None:
+        df = compact_report(pd.read_csv(DATA_URL, nrows=nrows, usecols=columns))
+        return stamp_version(sort_by_country(df), version)
+
+    shared = attach(SHARED_NAME, version)
+    if shared is not None:
+        return shared
+    df = read_report(ingest_report(kind, date), columns=columns)
+    if nrows is not None:
+        df = df.head(nrows)
+
+    return publish(SHARED_NAME, version, sort_by_country(df), keep=SHARED_REPORTS)
+
+
+@cached
+def country_rows(df):
+    """
+    Function maps every country of a report sorted by country to its block of rows.
+
+    :param df: DataFrame from load_data
+    :return: dict of country -> (start, stop)
+    """
+    country = df["Country_Region"]
+    codes = country.cat.codes.to_numpy()
+    positions = np.arange(len(country.cat.categories))
+    starts = np.searchsorted(codes, positions, side="left")
+    stops = np.searchsorted(codes, positions, side="right")
+
+    return {name: (start, stop) for name, start, stop in zip(country.cat.categories, starts, stops) if stop > start}
+
+
+def country_slice(df, country):
+    """
+    Function returns the rows of one country as a positional slice instead of a boolean scan.
+
+    :param df: DataFrame from load_data
+    :param country: str
     :return: DataFrame
     """
-    df = pd.read_csv(DATA_URL, nrows=nrows)
+    start, stop = country_rows(df).get(country, (0, 0))
 
-    return df
+    return df.iloc[start:stop]
@@ -1,36 +1,324 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
 import pandas as pd
-import streamlit as st
+from src.pages.utils.data_version import data_version, stamp_version
+from src.pages.utils.fetcher import get_fetcher
+from src.pages.utils import snapshot_store
+from src.pages.utils.shared_dataset import attach, build_lock, publish
+from src.pages.utils.time_series_cube import extend_cube
+from src.pages.utils.tracing import traced
+
+TIME_SERIES_URL = "{}/csse_covid_19_time_series/time_series_covid19_{}_global.csv"
+METRICS = {
+    "Confirmed": "confirmed",
+    "Deaths": "deaths",
+    "Recovered": "recovered",
+}
+KEY_COLUMNS = ["Province/State", "Country/Region", "Lat", "Long"]
+REFRESH_INTERVAL = int(os.environ.get("COVID_TIME_SERIES_REFRESH_INTERVAL", 3600))
+SHARED_NAME = "time_series"
+
+# locations: DataFrame of KEY_COLUMNS, one row per location
+# dates: DatetimeIndex
+# values: dict of metric -> int32 array of shape (len(locations), len(dates))
+WideSeries = namedtuple("WideSeries", ["locations", "dates", "values"])
+
+
+def time_series_url(metric):
+    """
+    Function returns the source location of a global time series.
+
+    :param metric: str, one of METRICS
+    :return: str
+    """
+    return TIME_SERIES_URL.format(snapshot_store.DATA_SOURCE.rstrip("/"), METRICS[metric])
+
+
+def parse_dates(columns):
+    """
+    Function parses the date header of a JHU time series in one vectorized call.
+
+    :param columns: list of str, e.g. ["1/22/20", ...]
+    :return: DatetimeIndex
+    """
+    return pd.to_datetime(pd.Index(columns), format="%m/%d/%y")
+
+
+def read_wide(source, after=None):
+    """
+    Function reads one wide JHU time series file.
+
+    :param source: str or file-like
+    :param after: Timestamp, only parse the date columns newer than this
+    :return: (DataFrame, DatetimeIndex, numpy.ndarray)
+    """
+    usecols = None
+    if after is not None:
+        usecols = lambda column: column in KEY_COLUMNS or datetime.strptime(column, "%m/%d/%y") > after
+    df = pd.read_csv(source, usecols=usecols)
+    date_columns = [column for column in df.columns if column not in KEY_COLUMNS]
+    values = df[date_columns].fillna(0).to_numpy(dtype="int32")
+
+    return df[KEY_COLUMNS], parse_dates(date_columns), values
+
+
+def location_keys(locations):
+    """
+    Function builds the (province, country) key identifying a location across metric files.
+
+    :param locations: DataFrame
+    :return: MultiIndex
+    """
+    return pd.MultiIndex.from_arrays([locations["Province/State"].fillna("").to_numpy(),
+                                      locations["Country/Region"].to_numpy()])
+
+
+def align_wide(parts):
+    """
+    Function aligns per metric wide tables on a common set of locations and dates.
+    The metric files do not list exactly the same locations (recoveries are reported
+    per country for some regions), so missing rows are zero filled.
+
+    :param parts: dict of metric -> (DataFrame, DatetimeIndex, numpy.ndarray)
+    :return: WideSeries
+    """
+    keys = None
+    locations = []
+    dates = None
+    for metric, (loc, metric_dates, _) in parts.items():
+        metric_keys = location_keys(loc)
+        if keys is None:
+            new = np.ones(len(metric_keys), dtype=bool)
+            keys = metric_keys
+        else:
+            new = keys.get_indexer(metric_keys) == -1
+            keys = keys.append(metric_keys[new])
+        locations.append(loc[new])
+        dates = metric_dates if dates is None else dates.intersection(metric_dates)
+    locations = pd.concat(locations, ignore_index=True)
+
+    values = {}
+    for metric, (loc, metric_dates, metric_values) in parts.items():
+        aligned = np.zeros((len(keys), len(dates)), dtype="int32")
+        aligned[keys.get_indexer(location_keys(loc))] = metric_values[:, metric_dates.get_indexer(dates)]
+        values[metric] = aligned
+
+    return WideSeries(locations, dates, values)
+
+
+def to_frame(wide, start=0):
+    """
+    Function lays a WideSeries out as one long frame with all metrics side by side.
+    Rows are ordered date-major (every location for the first date, then the next, ...)
+    so that newer dates only ever append to the end of the frame.
+
+    :param wide: WideSeries
+    :param start: int, index of the first date to include
+    :return: DataFrame
+    """
+    dates = wide.dates[start:]
+    n_locations = len(wide.locations)
+    province = pd.Categorical(wide.locations["Province/State"])
+    country = pd.Categorical(wide.locations["Country/Region"])
+    frame = pd.DataFrame({
+        "Province/State": pd.Categorical.from_codes(np.tile(province.codes, len(dates)), province.categories),
+        "Country/Region": pd.Categorical.from_codes(np.tile(country.codes, len(dates)), country.categories),
+        "Lat": np.tile(wide.locations["Lat"].to_numpy(dtype="float32"), len(dates)),
+        "Long": np.tile(wide.locations["Long"].to_numpy(dtype="float32"), len(dates)),
+        "Date": np.repeat(dates.to_numpy(), n_locations),
+    })
+    for metric, values in wide.values.items():
+        frame[metric] = values[:, start:].T.ravel()
+
+    return stamp_version(frame, wide_version(wide))
+
+
+def from_frame(frame):
+    """
+    Function recovers the WideSeries a combined frame was laid out from. The value arrays are
+    transposed views of the frame's columns, not copies.
+
+    :param frame: DataFrame from to_frame
+    :return: WideSeries
+    """
+    all_dates = frame["Date"].to_numpy()
+    n_locations = int(np.searchsorted(all_dates, all_dates[0], side="right"))
+    locations = pd.DataFrame({column: frame[column].iloc[:n_locations].to_numpy(dtype=object)
+                              for column in KEY_COLUMNS})
+    dates = pd.DatetimeIndex(all_dates[::n_locations])
+    values = {metric: frame[metric].to_numpy().reshape(len(dates), n_locations).T for metric in METRICS}
 
+    return WideSeries(locations, dates, values)
 
-@st.cache
+
+def wide_version(wide):
+    """
+    Function returns the data version of a WideSeries.
+
+    :param wide: WideSeries
+    :return: str
+    """
+    return "ts-{}-{}x{}".format(wide.dates[-1].strftime("%Y-%m-%d"), len(wide.locations), len(wide.dates))
+
+
+def fetch_time_series():
+    """
+    Function downloads the confirmed, deaths and recovered global time series concurrently.
+
+    :return: dict of metric -> FetchResult
+    """
+    urls = {metric: time_series_url(metric) for metric in METRICS}
+    results = get_fetcher().fetch_many(list(urls.values()))
+
+    return {metric: results[url] for metric, url in urls.items()}
+
+
+def load_wide():
+    """
+    Function reads and aligns the confirmed, deaths and recovered global time series.
+
+    :return: WideSeries
+    """
+    results = fetch_time_series()
+
+    return align_wide({metric: read_wide(BytesIO(result.content)) for metric, result in results.items()})
+
+
+class TimeSeriesRefresher:
+    """
+    Holds the time series and keeps it current. A refresh only parses the date columns upstream
+    added since the last one and appends them to the combined frame and the cube, so a daily
+    update costs one column instead of the full history.
+
+    The frame itself lives in the shared dataset store: one worker process builds and publishes
+    each version, and every worker attaches to the memory mapped file, so adding a worker costs
+    almost no extra memory.
+    """
+
+    def __init__(self):
+        self.frame = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def load(self):
+        """
+        Function (re)loads the full history and publishes it.
+
+        :return: None
+        """
+        wide = load_wide()
+        self.frame = publish(SHARED_NAME, wide_version(wide), to_frame(wide), current=True)
+
+    @traced("load.time_series_refresh")
+    def refresh(self):
+        """
+        Function moves to the version another worker published, or else appends the dates published
+        upstream since the last refresh. Falls back to a full load when nothing is held yet or
+        upstream changed its set of locations.
+
+        :return: bool, whether new data was added
+        """
+        with self._lock, build_lock(SHARED_NAME):
+            shared = attach(SHARED_NAME)
+            if shared is not None and (self.frame is None or data_version(shared) != data_version(self.frame)):
+                self.frame = shared
+                return True
+            return self._refresh()
+
+    def _refresh(self):
+        if self.frame is None:
+            self.load()
+            return True
+        wide = from_frame(self.frame)
+        results = fetch_time_series()
+        if not any(result.modified for result in results.values()):
+            return False
+        parts = {metric: read_wide(BytesIO(result.content), after=wide.dates[-1])
+                 for metric, result in results.items()}
+        new_dates = None
+        for _, dates, _ in parts.values():
+            new_dates = dates if new_dates is None else new_dates.intersection(dates)
+        if len(new_dates) == 0:
+            return False
+
+        keys = location_keys(wide.locations)
+        values = {}
+        for metric, (loc, dates, metric_values) in parts.items():
+            indexer = keys.get_indexer(location_keys(loc))
+            if (indexer == -1).any():
+                self.load()
+                return True
+            block = np.zeros((len(keys), len(new_dates)), dtype="int32")
+            block[indexer] = metric_values[:, dates.get_indexer(new_dates)]
+            values[metric] = block
+
+        tail = to_frame(WideSeries(wide.locations, new_dates, values))
+        version = wide_version(WideSeries(wide.locations, wide.dates.append(new_dates), values))
+        stamp_version(tail, version)
+        frame = pd.concat([self.frame, tail], ignore_index=True)
+        extend_cube(data_version(self.frame), tail)
+        self.frame = publish(SHARED_NAME, version, frame, current=True)
+
+        return True
+
+    def time_series_dict(self):
+        """
+        Function returns the current data in the time_series_dict shape.
+
+        :return: dict
+        """
+        if self.frame is None:
+            self.refresh()
+        frame = self.frame
+
+        return {metric: frame for metric in METRICS}
+
+    def start(self, interval=REFRESH_INTERVAL):
+        """
+        Function starts a daemon thread that refreshes the data every interval seconds.
+
+        :param interval: int, seconds
+        :return: None
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception:
+                    pass
+
+        self._thread = threading.Thread(target=run, name="time-series-refresh", daemon=True)
+        self._thread.start()
+
+
+_REFRESHER = TimeSeriesRefresher()
+_REFRESHER_LOCK = threading.Lock()
+
+
+@traced("load.load_time_series")
 def load_time_series():
     """
     Function aggregates and returns a dictionary of time series data.
+    Every metric maps to the same combined frame, which holds Confirmed, Deaths and
+    Recovered side by side with categorical location keys and int32 counts. The data is
+    attached from the shared dataset store, built there by whichever worker gets to it first, and
+    kept current by a background incremental refresh.
 
     :return: dict
     """
-    confirmed_data = pd.read_csv(
-        "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_confirmed_global.csv")
-    death_data = pd.read_csv(
-        "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_deaths_global.csv")
-    recovered_data = pd.read_csv(
-        "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_recovered_global.csv")
-
-    confirmed_data = confirmed_data.melt(id_vars=['Province/State', 'Country/Region', 'Lat', 'Long'],
-                                         var_name="Date", value_name="Confirmed")
-    confirmed_data["Confirmed"] = confirmed_data["Confirmed"].fillna(0)
-    confirmed_data.loc[:, "Date"] = confirmed_data["Date"].apply(lambda s: pd.to_datetime(s).date())
-    death_data = death_data.melt(id_vars=['Province/State', 'Country/Region', 'Lat', 'Long'],
-                                 var_name="Date", value_name="Deaths")
-    death_data["Deaths"] = death_data["Deaths"].fillna(0)
-    death_data.loc[:, "Date"] = death_data["Date"].apply(lambda s: pd.to_datetime(s).date())
-    recovered_data = recovered_data.melt(id_vars=['Province/State', 'Country/Region', 'Lat', 'Long'],
-                                         var_name="Date", value_name="Recovered")
-    recovered_data["Recovered"] = recovered_data["Recovered"].fillna(0)
-    recovered_data.loc[:, "Date"] = recovered_data["Date"].apply(lambda s: pd.to_datetime(s).date())
-
-    return {
-        "Confirmed": confirmed_data,
-        "Deaths": death_data,
-        "Recovered": recovered_data
-    }
+    with _REFRESHER_LOCK:
+        if _REFRESHER.frame is None:
+            _REFRESHER.refresh()
+            _REFRESHER.start()
+
+    return _REFRESHER.time_series_dict()
@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+from src.pages.utils.rank_index import REPORT_METRICS, get_rank_index
+from src.pages.utils.rolling_analytics import get_analytics
+from src.pages.utils.time_series_cube import daily_deltas, get_cube
+from src.pages.utils.tracing import traced
+
+
+def country_totals(df):
+    """
+    Function returns every report metric summed per country.
+
+    :param df: DataFrame, daily report
+    :return: DataFrame indexed by Country_Region
+    """
+    return get_rank_index(df).country_totals
+
+
+def province_totals(df, country):
+    """
+    Function returns every report metric summed per province of a country.
+
+    :param df: DataFrame, daily report
+    :param country: str
+    :return: DataFrame indexed by Province_State
+    """
+    return get_rank_index(df).provinces(country)
+
+
+@traced("aggregate.snapshot_totals")
+def snapshot_totals(df, country=None):
+    """
+    Function returns the total of every report metric, worldwide or for one country.
+
+    :param df: DataFrame, daily report
+    :param country: str
+    :return: Series indexed by metric
+    """
+    totals = country_totals(df)
+    if country:
+        return totals.loc[country]
+
+    return totals.sum()
+
+
+def top_countries(df, n=10):
+    """
+    Function returns the n leading countries of every metric.
+
+    :param df: DataFrame, daily report
+    :param n: int
+    :return: dict of metric -> Series, largest first
+    """
+    ranks = get_rank_index(df)
+
+    return {metric: ranks.top_countries(metric, n) for metric in REPORT_METRICS}
+
+
+def top_provinces(df, country, n=10):
+    """
+    Function returns the n leading provinces of a country for every metric.
+
+    :param df: DataFrame, daily report
+    :param country: str
+    :param n: int
+    :return: dict of metric -> Series, largest first
+    """
+    ranks = get_rank_index(df)
+
+    return {metric: ranks.top_provinces(country, metric, n) for metric in REPORT_METRICS}
+
+
+@traced("aggregate.timeline")
+def timeline(time_series, feature, country=None):
+    """
+    Function returns the cumulative series of a metric and its daily delta.
+
+    :param time_series: DataFrame, combined time series frame
+    :param feature: str
+    :param country: str, worldwide when None
+    :return: DataFrame with Date, feature and Delta_feature columns
+    """
+    return get_cube(time_series).timeline(feature, country or None)
+
+
+@traced("aggregate.analytics_timeline")
+def analytics_timeline(time_series, analytic, feature, country=None):
+    """
+    Function returns a rolling analytic (moving average, growth rate, doubling time or per capita
+    count) of a metric.
+
+    :param time_series: DataFrame, combined time series frame
+    :param analytic: str, one of rolling_analytics.ANALYTICS
+    :param feature: str
+    :param country: str, worldwide when None
+    :return: DataFrame with Date and analytic columns
+    """
+    return get_analytics(time_series).timeline(analytic, feature, country or None)
+
+
+@traced("aggregate.compare")
+def compare(time_series, feature, countries, start=None, end=None, view="cumulative"):
+    """
+    Function returns the series of several countries side by side over an optional date window.
+    All series come from one gather over the cube (or the rolling analytics), not one scan each.
+
+    :param time_series: DataFrame, combined time series frame
+    :param feature: str
+    :param countries: list of str
+    :param start: date-like, from the first date when None
+    :param end: date-like, to the last date when None
+    :param view: str, "cumulative", "daily" or one of rolling_analytics.ANALYTICS
+    :return: DataFrame with a Date column and one column per country
+    """
+    countries = list(countries)
+    cube = get_cube(time_series)
+    window = cube.window(start, end)
+    if view == "cumulative":
+        values = cube.gather(feature, countries, window).astype("float64")
+    elif view == "daily":
+        first, stop, _ = window.indices(len(cube.dates))
+        values = np.full((len(countries), max(stop - first, 0)), np.nan)
+        block = cube.gather(feature, countries, slice(max(first - 1, 0), stop))
+        values[:, values.shape[1] - block.shape[1] + 1:] = np.clip(np.diff(block, axis=1), 0, None)
+    else:
+        values = get_analytics(time_series).gather(view, feature, countries, window)
+    frame = pd.DataFrame(values.T, columns=countries)
+    frame.insert(0, "Date", cube.dates[window])
+
+    return frame
+
+
+@traced("aggregate.day_change")
+def day_change(time_series, country=None, date=None):
+    """
+    Function returns the change of every metric, including active cases, over one day.
+
+    :param time_series: DataFrame, combined time series frame
+    :param country: str
+    :param date: date-like, the day ending the change, the most recent one when None
+    :return: dict of metric -> int
+    """
+    change = get_cube(time_series).day_change(country or None, date)
+    change["Active"] = change["Confirmed"] - change["Deaths"] - change["Recovered"]
+
+    return change
+
+
+@traced("aggregate.headline_stats")
+def headline_stats(df):
+    """
+    Function computes the headline numbers of a daily report.
+
+    :param df: DataFrame, daily report
+    :return: dict with countries, totals and, per metric, the leading (country, count)
+    """
+    ranks = get_rank_index(df)
+
+    return {
+        "countries": len(ranks.country_totals),
+        "totals": ranks.country_totals.sum(),
+        "leaders": {metric: ranks.leader(metric) for metric in REPORT_METRICS},
+    }
+
+
+@traced("aggregate.selection_metrics")
+def selection_metrics(report, time_series, country=None, n=10):
+    """
+    Function computes every metric the Dashboard shows for a selection in one pass: the report
+    side comes from one rank index lookup, and the timelines, deltas and one day change of every
+    metric from one (dates, metrics) block of the cube.
+
+    :param report: DataFrame, daily report
+    :param time_series: DataFrame, combined time series frame
+    :param country: str, worldwide when None
+    :param n: int, size of the top lists
+    :return: dict with totals, top (metric -> Series), timelines (metric -> DataFrame as returned by
+             timeline) and day_change (metric -> int)
+    """
+    country = country or None
+    ranks = get_rank_index(report)
+    cube = get_cube(time_series)
+    block = cube.block(country)
+    deltas = daily_deltas(block)
+    change = block[-1] - block[-2] if len(block) > 1 else np.zeros(len(cube.metrics), dtype="int64")
+    day = {metric: int(change[i]) for i, metric in enumerate(cube.metrics)}
+    day["Active"] = day["Confirmed"] - day["Deaths"] - day["Recovered"]
+    if country:
+        totals = ranks.country_totals.loc[country]
+        top = {metric: ranks.top_provinces(country, metric, n) for metric in REPORT_METRICS}
+    else:
+        totals = ranks.country_totals.sum()
+        top = {metric: ranks.top_countries(metric, n) for metric in REPORT_METRICS}
+
+    return {
+        "totals": totals,
+        "top": top,
+        "timelines": {metric: pd.DataFrame({"Date": cube.dates, metric: block[:, i],
+                                            "Delta_{}".format(metric): deltas[:, i]})
+                      for i, metric in enumerate(cube.metrics)},
+        "day_change": day,
+    }
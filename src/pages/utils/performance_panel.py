@@ -0,0 +1,34 @@
+import pandas as pd
+import streamlit as st
+from src.pages.utils.tracing import tracer
+
+
+def performance_panel():
+    """
+    Function renders the recorded spans, cache counters and payload sizes in the sidebar.
+
+    :return: None
+    """
+    snapshot = tracer.snapshot()
+    spans = pd.DataFrame.from_dict(snapshot["spans"], orient="index")
+    st.sidebar.subheader("Spans")
+    if spans.empty:
+        st.sidebar.text("Nothing recorded yet")
+    else:
+        spans["mean_ms"] = 1000 * spans["total_seconds"] / spans["count"]
+        spans["last_ms"] = 1000 * spans["last_seconds"]
+        spans["max_ms"] = 1000 * spans["max_seconds"]
+        st.sidebar.dataframe(spans[["count", "mean_ms", "last_ms", "max_ms"]].sort_values("mean_ms", ascending=False))
+    if snapshot["counters"]:
+        st.sidebar.subheader("Counters")
+        st.sidebar.dataframe(pd.DataFrame(snapshot["counters"]).set_index(["name", "label"]))
+    if snapshot["sizes"]:
+        st.sidebar.subheader("Payload sizes")
+        st.sidebar.dataframe(pd.DataFrame.from_dict(snapshot["sizes"], orient="index"))
+    st.sidebar.subheader("Caches")
+    st.sidebar.json(snapshot["collectors"])
+    export = st.sidebar.selectbox("Export", ["Prometheus", "JSON"])
+    if export == "JSON":
+        st.sidebar.code(tracer.export_json(), language="json")
+    else:
+        st.sidebar.code(tracer.export_prometheus())
@@ -0,0 +1,129 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from src.pages.utils.data_version import data_version
+from src.pages.utils.tracing import traced
+
+REPORT_METRICS = ["Confirmed", "Deaths", "Recovered", "Active"]
+# Reports whose index is kept: the Dashboard projection of the latest and of a few dates picked
+# on the report slider, and the US totals report.
+KEEP_INDEXES = 8
+
+
+class RankIndex:
+    """
+    Per snapshot ranking of countries, and of provinces within each country, for every metric.
+    Built once per data version so leaderboards and headline stats of any size are slices of
+    precomputed orders instead of fresh groupby + nlargest passes.
+    """
+
+    def __init__(self, country_totals, province_totals):
+        self.country_totals = country_totals
+        self.province_totals = province_totals
+        self._country_order = {metric: np.argsort(-country_totals[metric].to_numpy(), kind="mergesort")
+                               for metric in REPORT_METRICS}
+
+        # province_totals is sorted by country, so each country owns a contiguous block of rows.
+        province_countries = province_totals.index.get_level_values(0)
+        self._province_bounds = {}
+        if len(province_totals):
+            codes, uniques = pd.factorize(province_countries)
+            starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+            stops = np.r_[starts[1:], len(codes)]
+            self._province_bounds = {uniques[code]: (start, stop)
+                                     for code, start, stop in zip(codes[starts], starts, stops)}
+        self._province_order = {}
+        for metric in REPORT_METRICS:
+            # Within each block, order rows by descending value; stable to match nlargest's tie order.
+            block = np.repeat(np.arange(len(self._province_bounds)),
+                              [stop - start for start, stop in self._province_bounds.values()])
+            self._province_order[metric] = np.lexsort((-province_totals[metric].to_numpy(), block))
+
+    def top_countries(self, metric, n=10):
+        """
+        Function returns the n countries with the highest value of a metric.
+
+        :param metric: str
+        :param n: int
+        :return: Series indexed by Country_Region, largest first
+        """
+        return self.country_totals[metric].iloc[self._country_order[metric][:n]]
+
+    def top_provinces(self, country, metric, n=10):
+        """
+        Function returns the n provinces of a country with the highest value of a metric.
+
+        :param country: str
+        :param metric: str
+        :param n: int
+        :return: Series indexed by Province_State, largest first
+        """
+        start, stop = self._province_bounds.get(country, (0, 0))
+        rows = self._province_order[metric][start:min(stop, start + n)]
+        top = self.province_totals[metric].iloc[rows]
+        top.index = top.index.get_level_values(1)
+
+        return top
+
+    def provinces(self, country):
+        """
+        Function returns the totals of every province of a country.
+
+        :param country: str
+        :return: DataFrame indexed by Province_State
+        """
+        start, stop = self._province_bounds.get(country, (0, 0))
+
+        return self.province_totals.iloc[start:stop].droplevel(0)
+
+    def leader(self, metric):
+        """
+        Function returns the country ranked first for a metric.
+
+        :param metric: str
+        :return: (str, number)
+        """
+        top = self.top_countries(metric, 1)
+
+        return top.index[0], top.iloc[0]
+
+
+@traced("aggregate.build_rank_index")
+def build_rank_index(df):
+    """
+    Function builds the rank index of a daily report.
+
+    :param df: DataFrame, daily report
+    :return: RankIndex
+    """
+    country_totals = df.groupby("Country_Region", observed=True)[REPORT_METRICS].sum()
+    province_totals = df.groupby(["Country_Region", "Province_State"], observed=True)[REPORT_METRICS].sum()
+
+    return RankIndex(country_totals, province_totals)
+
+
+_INDEXES = OrderedDict()
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_rank_index(df):
+    """
+    Function returns the rank index of a daily report, building it once per data version. Indexes
+    are kept outside the figure cache, so evicting figures never forces a rebuild; only reports
+    beyond the KEEP_INDEXES most recently used lose theirs.
+
+    :param df: DataFrame, daily report
+    :return: RankIndex
+    """
+    version = data_version(df)
+    with _INDEXES_LOCK:
+        ranks = _INDEXES.get(version)
+        if ranks is None:
+            ranks = _INDEXES[version] = build_rank_index(df)
+            while len(_INDEXES) > KEEP_INDEXES:
+                _INDEXES.popitem(last=False)
+        _INDEXES.move_to_end(version)
+
+    return ranks
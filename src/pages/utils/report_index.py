@@ -0,0 +1,261 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from src.pages.utils import snapshot_store
+from src.pages.utils.fetcher import get_fetcher
+from src.pages.utils.tracing import traced
+
+MAX_PROBE_DEPTH = int(os.environ.get("COVID_MAX_PROBE_DEPTH", 7))
+REFRESH_INTERVAL = int(os.environ.get("COVID_INDEX_REFRESH_INTERVAL", 900))
+FAILURE_THRESHOLD = 3
+COOLDOWN = 300
+# Date of the first report upstream published of each kind, where the backward search stops.
+FIRST_REPORTS = {
+    "global": datetime(2020, 1, 22),
+    "us": datetime(2020, 4, 12),
+}
+
+
+def _is_missing(error):
+    """
+    Function tells a report that has not been published apart from an unreachable source.
+    The fetch layer raises FileNotFoundError for missing files, both local and HTTP 404.
+
+    :param error: Exception
+    :return: bool
+    """
+    return isinstance(error, FileNotFoundError)
+
+
+class ReportIndex:
+    """
+    Manifest of the daily reports available locally, answering "latest available date" without
+    touching the network. New reports are discovered by probing at most ``max_probe`` days back from
+    today. When that finds nothing and nothing is stored, e.g. on a fresh deploy after upstream
+    stopped publishing, the newest report is located with a bisection back to the first one. A
+    circuit breaker stops probing an unreachable source for ``cooldown`` seconds after
+    ``failure_threshold`` consecutive failures, falling back to the last good snapshot.
+    """
+
+    def __init__(self, kind="global", max_probe=MAX_PROBE_DEPTH, failure_threshold=FAILURE_THRESHOLD,
+                 cooldown=COOLDOWN):
+        self.kind = kind
+        self.max_probe = max_probe
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._dates = set()
+        self._latest = None
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._thread = None
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Function rebuilds the manifest from the local store and, when the source is a local
+        directory, from its listing.
+
+        :return: None
+        """
+        dates = set(snapshot_store.list_reports(self.kind))
+        folder = os.path.join(snapshot_store.DATA_SOURCE, snapshot_store.REPORT_FOLDERS[self.kind])
+        if os.path.isdir(folder):
+            for name in os.listdir(folder):
+                try:
+                    dates.add(datetime.strptime(name, "%m-%d-%Y.csv"))
+                except ValueError:
+                    continue
+        with self._lock:
+            self._dates |= dates
+            if self._dates:
+                self._latest = max(self._dates)
+
+    def add(self, date):
+        """
+        Function records a report date as available.
+
+        :param date: datetime object
+        :return: None
+        """
+        date = datetime(date.year, date.month, date.day)
+        with self._lock:
+            self._dates.add(date)
+            if self._latest is None or date > self._latest:
+                self._latest = date
+
+    def latest(self):
+        """
+        Function returns the newest known report date.
+
+        :return: datetime object or None
+        """
+        return self._latest
+
+    def dates(self):
+        """
+        Function returns every known report date, oldest first.
+
+        :return: list of datetime objects
+        """
+        with self._lock:
+            return sorted(self._dates)
+
+    def breaker_open(self):
+        """
+        Function tells whether probing is currently suspended.
+
+        :return: bool
+        """
+        if self._opened_at is None:
+            return False
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            # Half-open: allow the next probe through and let its outcome decide.
+            self._opened_at = None
+            return False
+        return True
+
+    @traced("load.probe_reports")
+    def probe(self, today=None):
+        """
+        Function looks for reports newer than the latest known one, walking back at most
+        max_probe days. Newly found reports are ingested into the store.
+
+        :param today: datetime object
+        :return: datetime object or None, the newest report found
+        """
+        today = today or datetime.today()
+        today = datetime(today.year, today.month, today.day)
+        with self._probe_lock:
+            if self.breaker_open():
+                return None
+            for offset in range(self.max_probe):
+                date = today - timedelta(days=offset)
+                if self._latest is not None and date <= self._latest:
+                    break
+                try:
+                    snapshot_store.ingest_report(self.kind, date)
+                except Exception as e:
+                    if _is_missing(e):
+                        continue
+                    self._failures += 1
+                    if self._failures >= self.failure_threshold:
+                        self._opened_at = time.monotonic()
+                    return None
+                self._failures = 0
+                self.add(date)
+                return date
+            self._failures = 0
+
+        return None
+
+    @traced("load.search_reports")
+    def search(self, today=None):
+        """
+        Function finds the newest report older than the probe window by bisecting between the
+        first report and today, relying on upstream publishing one report every day until it
+        stopped. Costs about log2(days) existence checks and ingests only the report found.
+
+        :param today: datetime object
+        :return: datetime object or None
+        """
+        today = today or datetime.today()
+        today = datetime(today.year, today.month, today.day)
+        fetcher = get_fetcher()
+        with self._probe_lock:
+            if self.breaker_open():
+                return None
+            try:
+                low, high = FIRST_REPORTS[self.kind], today - timedelta(days=self.max_probe - 1)
+                if low >= high or not fetcher.exists(snapshot_store.source_url(self.kind, low)):
+                    return None
+                # Invariant: the report of low exists and the one of high does not.
+                while (high - low).days > 1:
+                    middle = low + timedelta(days=(high - low).days // 2)
+                    if fetcher.exists(snapshot_store.source_url(self.kind, middle)):
+                        low = middle
+                    else:
+                        high = middle
+                snapshot_store.ingest_report(self.kind, low)
+            except Exception as e:
+                if _is_missing(e):
+                    return None
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._opened_at = time.monotonic()
+                return None
+            self._failures = 0
+        self.add(low)
+
+        return low
+
+    def resolve(self, today=None):
+        """
+        Function resolves the date of the report pages should show. Probing only happens
+        synchronously while the index is empty; otherwise the background refresh keeps it current.
+
+        :param today: datetime object
+        :return: datetime object
+        """
+        if self._latest is None:
+            self.probe(today)
+        if self._latest is None:
+            self.search(today)
+        if self._latest is None:
+            raise LookupError("No {} daily report found upstream and none stored locally".format(self.kind))
+
+        return self._latest
+
+    def start(self, interval=REFRESH_INTERVAL):
+        """
+        Function starts a daemon thread that probes for new reports every interval seconds.
+
+        :param interval: int, seconds
+        :return: None
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def run():
+            while True:
+                try:
+                    self.probe()
+                except Exception:
+                    pass
+                time.sleep(interval)
+
+        self._thread = threading.Thread(target=run, name="report-index-{}".format(self.kind), daemon=True)
+        self._thread.start()
+
+
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_report_index(kind="global"):
+    """
+    Function returns the process wide index for a report kind, starting its background refresh.
+
+    :param kind: str
+    :return: ReportIndex
+    """
+    with _INDEXES_LOCK:
+        if kind not in _INDEXES:
+            _INDEXES[kind] = ReportIndex(kind)
+            _INDEXES[kind].start()
+
+    return _INDEXES[kind]
+
+
+@traced("load.latest_report_date")
+def latest_report_date(kind="global"):
+    """
+    Function returns the date of the newest available report.
+
+    :param kind: str
+    :return: datetime object
+    """
+    return get_report_index(kind).resolve()
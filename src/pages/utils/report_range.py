@@ -0,0 +1,104 @@
+import argparse
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from src.pages.utils import snapshot_store
+from src.pages.utils.report_index import get_report_index
+from src.pages.utils.shared_dataset import build_lock
+from src.pages.utils.tracing import traced
+
+HISTORY_DAYS = int(os.environ.get("COVID_HISTORY_DAYS", 180))
+# Every Streamlit worker starts the history ingest, next to the figure warm-up, so one small pool
+# does it at a time rather than one pool per core per worker.
+INGEST_PROCESSES = int(os.environ.get("COVID_INGEST_PROCESSES", 2))
+FIRST_REPORT = datetime(2020, 1, 22)
+
+
+def _init_worker(data_source, store_path):
+    snapshot_store.DATA_SOURCE = data_source
+    snapshot_store.STORE_PATH = store_path
+
+
+def _ingest_one(kind, date):
+    try:
+        snapshot_store.ingest_report(kind, date)
+    except Exception:
+        # Missing or unreachable reports are left out; the next run picks them up.
+        return None
+
+    return date
+
+
+@traced("load.ingest_range")
+def ingest_range(kind, start, end, processes=INGEST_PROCESSES):
+    """
+    Function ingests every daily report between start and end (inclusive) that is not stored yet,
+    downloading and parsing them in parallel on a process pool. Every report lands in its own
+    date partition of the snapshot store, normalized to the current schema. Ingests are serialized
+    across processes, so a worker that waited for another one only ingests what is still missing.
+
+    :param kind: str, one of snapshot_store.REPORT_FOLDERS
+    :param start: datetime object
+    :param end: datetime object
+    :param processes: int
+    :return: list of datetime objects, the dates that were ingested
+    """
+    start = max(datetime(start.year, start.month, start.day), FIRST_REPORT)
+    end = datetime(end.year, end.month, end.day)
+    dates = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    with build_lock("reports"):
+        stored = set(snapshot_store.list_reports(kind))
+        dates = [date for date in dates if date not in stored]
+        if not dates:
+            return []
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_init_worker,
+                                 initargs=(snapshot_store.DATA_SOURCE, snapshot_store.STORE_PATH)) as executor:
+            ingested = [date for date in executor.map(_ingest_one, [kind] * len(dates), dates)
+                        if date is not None]
+    index = get_report_index(kind)
+    for date in ingested:
+        index.add(date)
+
+    return ingested
+
+
+_started = set()
+_started_lock = threading.Lock()
+
+
+def ensure_history(kind="global", days=HISTORY_DAYS):
+    """
+    Function starts a background ingest of the last days of reports, once per process.
+
+    :param kind: str
+    :param days: int
+    :return: None
+    """
+    with _started_lock:
+        if kind in _started:
+            return
+        _started.add(kind)
+    end = get_report_index(kind).latest() or datetime.today()
+    thread = threading.Thread(target=ingest_range, args=(kind, end - timedelta(days=days - 1), end),
+                              name="ingest-range-{}".format(kind), daemon=True)
+    thread.start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest a range of daily reports into the local store.")
+    parser.add_argument("--kind", default="global", choices=list(snapshot_store.REPORT_FOLDERS))
+    parser.add_argument("--start", default=FIRST_REPORT.strftime("%Y-%m-%d"), help="YYYY-MM-DD")
+    parser.add_argument("--end", default=datetime.today().strftime("%Y-%m-%d"), help="YYYY-MM-DD")
+    parser.add_argument("--processes", type=int, default=INGEST_PROCESSES)
+    args = parser.parse_args(argv)
+    ingested = ingest_range(args.kind, datetime.strptime(args.start, "%Y-%m-%d"),
+                            datetime.strptime(args.end, "%Y-%m-%d"), args.processes)
+    print("Ingested {} {} reports".format(len(ingested), args.kind))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import threading
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from src.pages.utils import snapshot_store
+from src.pages.utils.data_version import data_version
+from src.pages.utils.fetcher import get_fetcher
+from src.pages.utils.time_series_cube import get_cube
+from src.pages.utils.tracing import traced
+
+WINDOW = 7
+PER_CAPITA = 100000
+LOOKUP_TABLE_URL = "{}/UID_ISO_FIPS_LookUp_Table.csv"
+# name -> label of every analytic series
+ANALYTICS = {
+    "average": "{}-day average".format(WINDOW),
+    "growth": "Growth rate (% per day)",
+    "doubling": "Doubling time (days)",
+    "per_capita": "Per {:,} people".format(PER_CAPITA),
+    "average_per_capita": "{}-day average per {:,} people".format(WINDOW, PER_CAPITA),
+}
+
+
+def load_population():
+    """
+    Function reads the population of every country from the JHU lookup table.
+
+    :return: Series indexed by country, empty when the table is unavailable
+    """
+    url = LOOKUP_TABLE_URL.format(snapshot_store.DATA_SOURCE.rstrip("/"))
+    try:
+        content = get_fetcher().fetch(url).content
+    except (FileNotFoundError, OSError):
+        return pd.Series(dtype="float64")
+    table = pd.read_csv(BytesIO(content), usecols=["Admin2", "Province_State", "Country_Region", "Population"])
+    countries = table[table["Province_State"].isna() & table["Admin2"].isna()]
+
+    return countries.groupby("Country_Region")["Population"].sum(min_count=1).astype("float64")
+
+
+def window_sums(values, window):
+    """
+    Function returns the sum over a trailing window along the date axis from one cumulative sum.
+    The first window - 1 dates have no full window and are NaN, so a series shorter than the
+    window is NaN throughout.
+
+    :param values: numpy.ndarray of shape (locations, dates, metrics)
+    :param window: int
+    :return: numpy.ndarray of the same shape
+    """
+    sums = np.full(values.shape, np.nan)
+    if values.shape[1] < window:
+        return sums
+    totals = np.cumsum(values, axis=1)
+    sums[:, window - 1] = totals[:, window - 1]
+    sums[:, window:] = totals[:, window:] - totals[:, :-window]
+
+    return sums
+
+
+class RollingAnalytics:
+    """
+    Rolling statistics of every metric for the whole world and every country, computed for all
+    of them at once from the cube's arrays, so a selection is a plain array lookup.
+    """
+
+    def __init__(self, cube, population, window=WINDOW):
+        self.dates = cube.dates
+        self.metrics = cube.metrics
+        self.window = window
+        self._position = {country: i + 1 for i, country in enumerate(cube.countries)}
+        self._metric_position = {metric: i for i, metric in enumerate(self.metrics)}
+        totals = np.concatenate([cube.world[np.newaxis], cube.values], axis=0).astype("float64")
+        daily = np.zeros(totals.shape)
+        np.clip(np.diff(totals, axis=1), 0, None, out=daily[:, 1:])
+
+        average = window_sums(daily, window) / window
+        previous = np.full(totals.shape, np.nan)
+        previous[:, window:] = totals[:, :-window]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(previous > 0, totals / previous, np.nan)
+            growth = np.power(ratio, 1.0 / window) - 1
+            doubling = np.where(growth > 0, np.log(2) / np.log1p(growth), np.nan)
+
+        people = population.reindex(cube.countries).to_numpy(dtype="float64")
+        people = np.concatenate([[population.sum() if len(population) else np.nan], people])
+        scale = np.where(people > 0, PER_CAPITA / people, np.nan)[:, np.newaxis, np.newaxis]
+        self.has_population = bool(np.isfinite(scale).any())
+        series = {
+            "average": average,
+            "growth": growth * 100,
+            "doubling": doubling,
+            "per_capita": totals * scale,
+            "average_per_capita": average * scale,
+        }
+        self._series = {name: values.astype("float32") for name, values in series.items()}
+
+    def series(self, analytic, metric, country=None):
+        """
+        Function returns an analytic series of a metric.
+
+        :param analytic: str, one of ANALYTICS
+        :param metric: str
+        :param country: str, worldwide when None
+        :return: numpy.ndarray of shape (len(dates),)
+        """
+        return self._series[analytic][self._position[country] if country else 0, :, self._metric_position[metric]]
+
+    def gather(self, analytic, metric, countries, window=slice(None)):
+        """
+        Function returns an analytic series of several countries over a date window in one gather.
+
+        :param analytic: str
+        :param metric: str
+        :param countries: list of str
+        :param window: slice of date positions, see TimeSeriesCube.window
+        :return: numpy.ndarray of shape (len(countries), days in window)
+        """
+        rows = [self._position[country] for country in countries]
+
+        return self._series[analytic][rows, window, self._metric_position[metric]]
+
+    def timeline(self, analytic, metric, country=None):
+        """
+        Function returns an analytic series in the shape plot_timeline renders.
+
+        :param analytic: str
+        :param metric: str
+        :param country: str
+        :return: DataFrame with Date and analytic columns
+        """
+        return pd.DataFrame({"Date": self.dates, analytic: self.series(analytic, metric, country)})
+
+
+_ANALYTICS = {}
+_ANALYTICS_LOCK = threading.Lock()
+
+
+@traced("aggregate.rolling_analytics")
+def get_analytics(df):
+    """
+    Function returns the rolling analytics of a time series frame, computing them once per data
+    version.
+
+    :param df: DataFrame, combined time series frame
+    :return: RollingAnalytics
+    """
+    version = data_version(df)
+    with _ANALYTICS_LOCK:
+        analytics = _ANALYTICS.get(version)
+        if analytics is None:
+            analytics = RollingAnalytics(get_cube(df), load_population())
+            _ANALYTICS.clear()
+            _ANALYTICS[version] = analytics
+
+    return analytics
@@ -0,0 +1,232 @@
+import contextlib
+import os
+import threading
+import time
+
+import numpy as np
+import pyarrow as pa
+from src.pages.utils.data_version import stamp_version
+from src.pages.utils.snapshot_store import PATH
+from src.pages.utils.tracing import traced
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SHARED_PATH = os.environ.get("COVID_SHARED_STORE", os.path.join(PATH, "data", "shared"))
+KEEP_VERSIONS = 2
+_CURRENT = "CURRENT"
+
+
+def dataset_path(name, version, extension=".arrow"):
+    """
+    Function returns the path of a published dataset version.
+
+    :param name: str, e.g. "time_series"
+    :param version: str, data version
+    :param extension: str, ".arrow" for frames, ".npy" for arrays
+    :return: str
+    """
+    return os.path.join(SHARED_PATH, name, "{}{}".format(version, extension))
+
+
+def current_version(name):
+    """
+    Function returns the version a dataset's CURRENT pointer names, if any.
+
+    :param name: str
+    :return: str or None
+    """
+    try:
+        with open(os.path.join(SHARED_PATH, name, _CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def pointer_age(name):
+    """
+    Function returns the seconds since a dataset's CURRENT pointer was last written or confirmed
+    (see confirm_current), so that workers can skip revalidating data another worker just checked.
+
+    :param name: str
+    :return: float, infinity when nothing was published
+    """
+    try:
+        return time.time() - os.path.getmtime(os.path.join(SHARED_PATH, name, _CURRENT))
+    except FileNotFoundError:
+        return float("inf")
+
+
+def confirm_current(name):
+    """
+    Function records that the CURRENT version of a dataset was found up to date.
+
+    :param name: str
+    :return: None
+    """
+    try:
+        os.utime(os.path.join(SHARED_PATH, name, _CURRENT))
+    except FileNotFoundError:
+        pass
+
+
+def _write_atomic(path, write):
+    tmp_path = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+@traced("load.shared_attach")
+def attach(name, version=None):
+    """
+    Function maps a published dataset into this process. Columns are views of the memory mapped
+    Arrow file, so every process attached to the same version shares one copy in the page cache.
+    Attached frames are read-only.
+
+    :param name: str
+    :param version: str, defaults to the CURRENT version
+    :return: DataFrame or None when the version was not published
+    """
+    version = version or current_version(name)
+    if version is None:
+        return None
+    path = dataset_path(name, version)
+    try:
+        source = pa.memory_map(path, "r")
+    except (FileNotFoundError, OSError):
+        return None
+    try:
+        # Attaching counts as a use, so pruning drops the least recently used versions.
+        os.utime(path)
+    except OSError:
+        pass
+    table = pa.ipc.open_file(source).read_all()
+
+    return stamp_version(table.to_pandas(split_blocks=True), version)
+
+
+@traced("load.shared_publish")
+def publish(name, version, df, current=False, keep=KEEP_VERSIONS):
+    """
+    Function publishes a dataset version once and attaches to it. With current=True the CURRENT
+    pointer is swapped to the new version atomically, so readers see either the old or the new
+    version, never a mix. Only the keep most recently published or attached versions (and the
+    CURRENT one) are kept.
+
+    :param name: str
+    :param version: str
+    :param df: DataFrame
+    :param current: bool
+    :param keep: int, versions kept, e.g. more for datasets with one version per report date
+    :return: DataFrame, the attached copy of df
+    """
+    path = dataset_path(name, version)
+    written = not os.path.exists(path)
+    if written:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        def write(tmp_path):
+            with pa.OSFile(tmp_path, "wb") as sink:
+                writer = pa.RecordBatchFileWriter(sink, table.schema)
+                writer.write_table(table)
+                writer.close()
+
+        _write_atomic(path, write)
+    if current:
+        def write_pointer(tmp_path):
+            with open(tmp_path, "w") as f:
+                f.write(version)
+
+        _write_atomic(os.path.join(SHARED_PATH, name, _CURRENT), write_pointer)
+    if written or current:
+        _prune(name, keep)
+
+    return attach(name, version)
+
+
+@traced("load.shared_attach")
+def attach_array(name, version):
+    """
+    Function maps a published array into this process, read-only.
+
+    :param name: str
+    :param version: str
+    :return: numpy.ndarray or None when the version was not published
+    """
+    try:
+        return np.load(dataset_path(name, version, ".npy"), mmap_mode="r")
+    except FileNotFoundError:
+        return None
+
+
+@traced("load.shared_publish")
+def publish_array(name, version, values):
+    """
+    Function publishes an array next to the frame of the same dataset version and attaches to it.
+    Publish the arrays of a version before its frame with current=True, so the version only
+    becomes current once all of its files exist.
+
+    :param name: str
+    :param version: str
+    :param values: numpy.ndarray
+    :return: numpy.ndarray, memory mapped
+    """
+    path = dataset_path(name, version, ".npy")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        def write(tmp_path):
+            with open(tmp_path, "wb") as f:
+                np.save(f, values)
+
+        _write_atomic(path, write)
+
+    return attach_array(name, version)
+
+
+def _prune(name, keep=KEEP_VERSIONS):
+    folder = os.path.join(SHARED_PATH, name)
+    current = current_version(name)
+    modified = {}
+    for file in os.listdir(folder):
+        version, extension = os.path.splitext(file)
+        if extension in (".arrow", ".npy") and version != current:
+            try:
+                mtime = os.path.getmtime(os.path.join(folder, file))
+            except FileNotFoundError:
+                continue
+            modified[version] = max(modified.get(version, 0), mtime)
+    keep -= current is not None
+    for version in sorted(modified, key=modified.get)[:max(len(modified) - keep, 0)]:
+        for extension in (".arrow", ".npy"):
+            # Processes still attached keep their mapping; the file is only unlinked.
+            try:
+                os.remove(dataset_path(name, version, extension))
+            except OSError:
+                pass
+
+
+@contextlib.contextmanager
+def build_lock(name):
+    """
+    Context manager serializing the builds of a dataset across processes, so that one worker
+    downloads and publishes a new version while the others wait and then attach to it.
+    Without fcntl (Windows) every process builds on its own.
+
+    :param name: str
+    :return: None
+    """
+    if fcntl is None:
+        yield
+        return
+    folder = os.path.join(SHARED_PATH, name)
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, ".lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
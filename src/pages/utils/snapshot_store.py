@@ -0,0 +1,247 @@
+import os
+import re
+import threading
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from src.pages.utils.fetcher import get_fetcher
+from src.pages.utils.tracing import traced
+
+PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../'))
+
+# Root of the JHU CSSE data tree. Point it at a local checkout (or any directory laid out like
+# ``csse_covid_19_data``) to ingest without touching GitHub.
+DATA_SOURCE = os.environ.get("COVID_DATA_SOURCE",
+                             "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data")
+STORE_PATH = os.environ.get("COVID_DATA_STORE", os.path.join(PATH, "data", "store"))
+
+REPORT_FOLDERS = {
+    "global": "csse_covid_19_daily_reports",
+    "us": "csse_covid_19_daily_reports_us",
+}
+
+# Upstream renamed columns several times; early reports use the names on the left.
+COLUMN_RENAMES = {
+    "Province/State": "Province_State",
+    "Country/Region": "Country_Region",
+    "Last Update": "Last_Update",
+    "Latitude": "Lat",
+    "Longitude": "Long_",
+    "Incidence_Rate": "Incident_Rate",
+    "Case-Fatality_Ratio": "Case_Fatality_Ratio",
+}
+# Early reports name some countries differently from the time series (and from later reports);
+# they are mapped onto the time series names so a report's countries can be looked up there.
+COUNTRY_RENAMES = {
+    "Mainland China": "China",
+    "Hong Kong": "China",
+    "Hong Kong SAR": "China",
+    "Macau": "China",
+    "Macao SAR": "China",
+    "Iran (Islamic Republic of)": "Iran",
+    "Republic of Korea": "Korea, South",
+    "South Korea": "Korea, South",
+    "Taiwan": "Taiwan*",
+    "Taipei and environs": "Taiwan*",
+    "Viet Nam": "Vietnam",
+    "Russian Federation": "Russia",
+    "Republic of Moldova": "Moldova",
+    "Republic of Ireland": "Ireland",
+    "North Ireland": "United Kingdom",
+    "UK": "United Kingdom",
+    "Czech Republic": "Czechia",
+    "occupied Palestinian territory": "West Bank and Gaza",
+    "Palestine": "West Bank and Gaza",
+    "Vatican City": "Holy See",
+    "Ivory Coast": "Cote d'Ivoire",
+    "Cape Verde": "Cabo Verde",
+    "East Timor": "Timor-Leste",
+    "The Bahamas": "Bahamas",
+    "Bahamas, The": "Bahamas",
+    "The Gambia": "Gambia",
+    "Gambia, The": "Gambia",
+    "Republic of the Congo": "Congo (Brazzaville)",
+    "Others": "Diamond Princess",
+    "Cruise Ship": "Diamond Princess",
+}
+REPORT_COLUMNS = ["Admin2", "Province_State", "Country_Region", "Last_Update", "Lat", "Long_",
+                  "Confirmed", "Deaths", "Recovered", "Active", "Combined_Key", "Incident_Rate"]
+CATEGORY_COLUMNS = ["Admin2", "Province_State", "Country_Region", "Combined_Key", "ISO3"]
+COUNT_COLUMNS = ["Confirmed", "Deaths", "Recovered", "Active"]
+FLOAT_COLUMNS = ["Lat", "Long_", "FIPS", "Incident_Rate", "Case_Fatality_Ratio",
+                 "Mortality_Rate", "Testing_Rate", "Hospitalization_Rate"]
+
+_REPORT_PATTERN = re.compile(r"(csse_covid_19_daily_reports(?:_us)?)/(\d{2}-\d{2}-\d{4})\.csv$")
+
+
+def source_url(kind, date):
+    """
+    Function builds the source location of a daily report.
+
+    :param kind: str, one of REPORT_FOLDERS
+    :param date: datetime object
+    :return: str
+    """
+    return "{}/{}/{}.csv".format(DATA_SOURCE.rstrip("/"), REPORT_FOLDERS[kind], date.strftime("%m-%d-%Y"))
+
+
+def parse_report_url(url):
+    """
+    Function extracts the report kind and date from a daily report url.
+
+    :param url: str
+    :return: (str, datetime object) or None if the url is not a daily report
+    """
+    match = _REPORT_PATTERN.search(url.replace(os.sep, "/"))
+    if match is None:
+        return None
+    kind = "us" if match.group(1).endswith("_us") else "global"
+
+    return kind, datetime.strptime(match.group(2), "%m-%d-%Y")
+
+
+def report_path(kind, date):
+    """
+    Function returns the local store path of a daily report.
+
+    :param kind: str
+    :param date: datetime object
+    :return: str
+    """
+    return os.path.join(STORE_PATH, kind, "{}.parquet".format(date.strftime("%Y-%m-%d")))
+
+
+def normalize_report(df):
+    """
+    Function maps every historical daily report layout onto the current one: renamed columns and
+    countries get their current names, Active and Combined_Key are derived when missing and any
+    other missing column is added empty.
+
+    :param df: DataFrame
+    :return: DataFrame
+    """
+    df = df.rename(columns=COLUMN_RENAMES)
+    if "Country_Region" in df.columns:
+        df["Country_Region"] = df["Country_Region"].replace(COUNTRY_RENAMES)
+    if "Active" not in df.columns and {"Confirmed", "Deaths", "Recovered"} <= set(df.columns):
+        df["Active"] = (pd.to_numeric(df["Confirmed"], errors="coerce").fillna(0)
+                        - pd.to_numeric(df["Deaths"], errors="coerce").fillna(0)
+                        - pd.to_numeric(df["Recovered"], errors="coerce").fillna(0))
+    if "Combined_Key" not in df.columns:
+        df["Combined_Key"] = (df["Province_State"].fillna("").astype(str) + ", "
+                              + df["Country_Region"].astype(str)).str.lstrip(", ")
+    for column in REPORT_COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+
+    return df
+
+
+def compact_report(df):
+    """
+    Function converts a raw daily report to compact dtypes. Location columns become categoricals,
+    counts become int32 (missing counts are stored as 0, which is how every consumer treats them)
+    and coordinates/rates become float32.
+
+    :param df: DataFrame
+    :return: DataFrame
+    """
+    for column in df.columns:
+        if column in CATEGORY_COLUMNS:
+            df[column] = df[column].astype("category")
+        elif column in COUNT_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors="coerce").fillna(0).astype("int32")
+        elif column in FLOAT_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float32")
+
+    return df
+
+
+def sort_by_country(df):
+    """
+    Function orders a report by country so that every country owns a contiguous block of rows.
+    Reports written by ingest_report are already sorted, in which case this is a single O(n) check.
+
+    :param df: DataFrame with a categorical Country_Region column
+    :return: DataFrame
+    """
+    if "Country_Region" not in df.columns:
+        return df
+    if not hasattr(df["Country_Region"], "cat"):
+        df["Country_Region"] = df["Country_Region"].astype("category")
+    codes = df["Country_Region"].cat.codes.to_numpy()
+    if len(codes) and (np.diff(codes) < 0).any():
+        df = df.iloc[np.argsort(codes, kind="mergesort")].reset_index(drop=True)
+
+    return df
+
+
+def write_report(df, path):
+    """
+    Function writes a report to the store atomically so readers never observe a partial file.
+
+    :param df: DataFrame
+    :param path: str
+    :return: str
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+    return path
+
+
+@traced("load.ingest_report")
+def ingest_report(kind, date, force=False):
+    """
+    Function copies a daily report from DATA_SOURCE into the local store.
+    Raises the underlying read error if the report does not exist upstream.
+
+    :param kind: str
+    :param date: datetime object
+    :param force: bool, re-ingest even if the report is already stored
+    :return: str, path of the stored report
+    """
+    path = report_path(kind, date)
+    if force or not os.path.exists(path):
+        result = get_fetcher().fetch(source_url(kind, date), revalidate=False)
+        df = sort_by_country(compact_report(normalize_report(pd.read_csv(BytesIO(result.content)))))
+        write_report(df, path)
+
+    return path
+
+
+@traced("load.read_report")
+def read_report(path, columns=None):
+    """
+    Function reads a stored report, optionally projecting to a subset of columns.
+
+    :param path: str
+    :param columns: list
+    :return: DataFrame
+    """
+    return pd.read_parquet(path, columns=columns)
+
+
+def list_reports(kind):
+    """
+    Function lists the dates of every report held in the store.
+
+    :param kind: str
+    :return: list of datetime objects, oldest first
+    """
+    folder = os.path.join(STORE_PATH, kind)
+    if not os.path.isdir(folder):
+        return []
+    dates = []
+    for name in os.listdir(folder):
+        if name.endswith(".parquet"):
+            try:
+                dates.append(datetime.strptime(name[:-len(".parquet")], "%Y-%m-%d"))
+            except ValueError:
+                continue
+
+    return sorted(dates)
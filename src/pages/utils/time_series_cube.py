@@ -0,0 +1,219 @@
+import threading
+
+import numpy as np
+import pandas as pd
+from src.pages.utils.data_version import data_version
+from src.pages.utils.tracing import traced
+
+METRIC_COLUMNS = ["Confirmed", "Deaths", "Recovered"]
+
+
+def daily_deltas(series):
+    """
+    Function returns the daily change of a cumulative series, clipped at zero. The first day has
+    no previous value and is NaN.
+
+    :param series: numpy.ndarray of shape (dates,) or (dates, metrics)
+    :return: numpy.ndarray of float64 of the same shape
+    """
+    deltas = np.empty(series.shape, dtype="float64")
+    deltas[0] = np.nan
+    np.subtract(series[1:], series[:-1], out=deltas[1:], casting="unsafe")
+
+    return np.clip(deltas, 0, None)
+
+
+class TimeSeriesCube:
+    """
+    Dense country x date x metric array built once per data version, so any series, its daily
+    deltas and its one-day change are plain array slices.
+    """
+
+    def __init__(self, countries, dates, values, version=None):
+        self.countries = countries
+        self.dates = dates
+        self.metrics = list(METRIC_COLUMNS)
+        self.values = values
+        self.world = values.sum(axis=0)
+        self.version = version
+        self._country_position = {country: i for i, country in enumerate(countries)}
+        self._metric_position = {metric: i for i, metric in enumerate(self.metrics)}
+
+    def extend(self, other):
+        """
+        Function appends the dates of a cube built over the same countries, updating the
+        derived aggregates in place.
+
+        :param other: TimeSeriesCube
+        :return: TimeSeriesCube
+        """
+        if not other.countries.equals(self.countries):
+            raise ValueError("Cannot extend a cube with a different set of countries")
+        values = np.concatenate([self.values, other.values], axis=1)
+        world = np.concatenate([self.world, other.world], axis=0)
+        self.__dict__.update(dates=self.dates.append(other.dates), values=values, world=world,
+                             version=other.version)
+
+        return self
+
+    def has_country(self, country):
+        """
+        Function tells whether the cube holds a country.
+
+        :param country: str
+        :return: bool
+        """
+        return country in self._country_position
+
+    def _rows(self, country=None):
+        if country is None:
+            return self.world
+        return self.values[self._country_position[country]]
+
+    def block(self, country=None):
+        """
+        Function returns the cumulative series of every metric.
+
+        :param country: str, worldwide when None
+        :return: numpy.ndarray of shape (len(dates), len(metrics))
+        """
+        return self._rows(country)
+
+    def series(self, metric, country=None):
+        """
+        Function returns the cumulative series of a metric.
+
+        :param metric: str
+        :param country: str, worldwide when None
+        :return: numpy.ndarray of shape (len(dates),)
+        """
+        return self._rows(country)[:, self._metric_position[metric]]
+
+    def deltas(self, metric, country=None):
+        """
+        Function returns the daily change of a metric, clipped at zero. The first day has no
+        previous value and is NaN.
+
+        :param metric: str
+        :param country: str
+        :return: numpy.ndarray of shape (len(dates),)
+        """
+        return daily_deltas(self.series(metric, country))
+
+    def day_change(self, country=None, date=None):
+        """
+        Function returns the change of every metric over one day.
+
+        :param country: str
+        :param date: date-like, the day ending the change, the most recent one when None
+        :return: dict of metric -> int
+        """
+        rows = self._rows(country)
+        position = len(self.dates) - 1 if date is None else self.dates.searchsorted(date, side="right") - 1
+        position = min(position, len(self.dates) - 1)
+        change = rows[position] - rows[position - 1] if position > 0 else np.zeros(len(self.metrics))
+
+        return {metric: int(change[i]) for i, metric in enumerate(self.metrics)}
+
+    def timeline(self, metric, country=None):
+        """
+        Function returns the timeline of a metric in the shape plot_timeline renders.
+
+        :param metric: str
+        :param country: str
+        :return: DataFrame with Date, metric and Delta_metric columns
+        """
+        return pd.DataFrame({
+            "Date": self.dates,
+            metric: self.series(metric, country),
+            "Delta_{}".format(metric): self.deltas(metric, country),
+        })
+
+    def window(self, start=None, end=None):
+        """
+        Function returns the positions of the dates between start and end, both included.
+
+        :param start: date-like, from the first date when None
+        :param end: date-like, to the last date when None
+        :return: slice
+        """
+        return self.dates.slice_indexer(start, end)
+
+    def gather(self, metric, countries, window=slice(None)):
+        """
+        Function returns the cumulative series of several countries over a date window in one
+        array gather, so the cost grows with countries x days rather than with the whole cube.
+
+        :param metric: str
+        :param countries: list of str
+        :param window: slice of date positions, see window
+        :return: numpy.ndarray of shape (len(countries), days in window)
+        """
+        rows = [self._country_position[country] for country in countries]
+
+        return self.values[rows, window, self._metric_position[metric]]
+
+
+@traced("aggregate.build_cube")
+def build_cube(df):
+    """
+    Function builds a TimeSeriesCube from the combined long format time series frame.
+
+    :param df: DataFrame with Country/Region, Date and metric columns
+    :return: TimeSeriesCube
+    """
+    country = df["Country/Region"].astype("category")
+    dates, date_codes = np.unique(df["Date"].to_numpy(), return_inverse=True)
+    n_dates = len(dates)
+    n_countries = len(country.cat.categories)
+    flat = country.cat.codes.to_numpy().astype("int64") * n_dates + date_codes
+    values = np.empty((n_countries, n_dates, len(METRIC_COLUMNS)), dtype="int64")
+    for i, metric in enumerate(METRIC_COLUMNS):
+        values[:, :, i] = np.bincount(flat, weights=df[metric].to_numpy(), minlength=n_countries * n_dates).reshape(
+            n_countries, n_dates)
+
+    return TimeSeriesCube(countries=country.cat.categories,
+                          dates=pd.DatetimeIndex(dates),
+                          values=values,
+                          version=data_version(df))
+
+
+_CUBES = {}
+_CUBES_LOCK = threading.Lock()
+
+
+def extend_cube(old_version, tail):
+    """
+    Function carries the cube of a previous data version forward by appending the dates of tail,
+    instead of rebuilding it from the whole frame. Falls back to a lazy rebuild when no cube
+    exists for old_version.
+
+    :param old_version: str
+    :param tail: DataFrame, rows for the new dates only, stamped with the new version
+    :return: None
+    """
+    with _CUBES_LOCK:
+        cube = _CUBES.pop(old_version, None)
+        if cube is not None:
+            try:
+                _CUBES[data_version(tail)] = cube.extend(build_cube(tail))
+            except ValueError:
+                pass
+
+
+def get_cube(df):
+    """
+    Function returns the cube for a time series frame, building it once per data version.
+
+    :param df: DataFrame
+    :return: TimeSeriesCube
+    """
+    version = data_version(df)
+    with _CUBES_LOCK:
+        cube = _CUBES.get(version)
+        if cube is None:
+            cube = build_cube(df)
+            _CUBES.clear()
+            _CUBES[version] = cube
+
+    return cube
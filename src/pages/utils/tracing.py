@@ -0,0 +1,242 @@
+import functools
+import json
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+TRACING_ENABLED = os.environ.get("COVID_TRACING", "1") != "0"
+
+
+class Tracer:
+    """
+    Lightweight in-process tracing. Spans are folded into per name aggregates (count, total,
+    max and last duration) as they close and counters/sizes are plain sums, so recording costs a
+    clock read and a dictionary update and memory does not grow with traffic.
+    """
+
+    def __init__(self, enabled=TRACING_ENABLED):
+        self.enabled = enabled
+        self._spans = {}
+        self._counters = {}
+        self._sizes = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name):
+        """
+        Function times the enclosed block under name.
+
+        :param name: str
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        """
+        Function adds a measured duration to the aggregate of a span.
+
+        :param name: str
+        :param seconds: float
+        :return: None
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            span = self._spans.get(name)
+            if span is None:
+                span = self._spans[name] = {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            span["count"] += 1
+            span["total_seconds"] += seconds
+            span["last_seconds"] = seconds
+            if seconds > span["max_seconds"]:
+                span["max_seconds"] = seconds
+
+    def count(self, name, label=None, value=1):
+        """
+        Function increments a counter, e.g. cache hits per function.
+
+        :param name: str
+        :param label: str
+        :param value: int
+        :return: None
+        """
+        if not self.enabled:
+            return
+        key = (name, label)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe_size(self, name, nbytes):
+        """
+        Function records a payload size.
+
+        :param name: str
+        :param nbytes: int
+        :return: None
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            size = self._sizes.setdefault(name, {"count": 0, "total_bytes": 0})
+            size["count"] += 1
+            size["total_bytes"] += nbytes
+            size["last_bytes"] = nbytes
+
+    def register_collector(self, name, collect):
+        """
+        Function registers a callable whose numeric dict output is included in every export,
+        for components that already keep their own counters.
+
+        :param name: str
+        :param collect: callable returning a dict of str -> number
+        :return: None
+        """
+        self._collectors[name] = collect
+
+    def snapshot(self):
+        """
+        Function returns everything recorded so far.
+
+        :return: dict
+        """
+        with self._lock:
+            result = {
+                "spans": {name: dict(span) for name, span in self._spans.items()},
+                "counters": [{"name": name, "label": label, "value": value}
+                             for (name, label), value in self._counters.items()],
+                "sizes": {name: dict(size) for name, size in self._sizes.items()},
+            }
+        result["collectors"] = {name: collect() for name, collect in self._collectors.items()}
+
+        return result
+
+    def export_json(self):
+        """
+        Function dumps the snapshot as JSON.
+
+        :return: str
+        """
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def export_prometheus(self, prefix="covid"):
+        """
+        Function dumps the snapshot in the Prometheus text exposition format.
+
+        :param prefix: str
+        :return: str
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name, kind, samples):
+            lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+            for labels, value in samples:
+                label_text = ",".join('{}="{}"'.format(key, str(val).replace('"', '\\"'))
+                                      for key, val in labels.items() if val is not None)
+                lines.append("{}_{}{} {}".format(prefix, name, "{" + label_text + "}" if label_text else "", value))
+
+        spans = snapshot["spans"]
+        metric("span_count", "counter", [({"span": name}, span["count"]) for name, span in spans.items()])
+        metric("span_seconds_total", "counter",
+               [({"span": name}, span["total_seconds"]) for name, span in spans.items()])
+        metric("span_seconds_max", "gauge", [({"span": name}, span["max_seconds"]) for name, span in spans.items()])
+        counters = {}
+        for counter in snapshot["counters"]:
+            counters.setdefault(counter["name"], []).append(({"label": counter["label"]}, counter["value"]))
+        for name, samples in counters.items():
+            metric("{}_total".format(name.replace(".", "_")), "counter", samples)
+        sizes = snapshot["sizes"]
+        metric("payload_bytes_total", "counter", [({"name": name}, size["total_bytes"]) for name, size in sizes.items()])
+        metric("payload_bytes_last", "gauge", [({"name": name}, size["last_bytes"]) for name, size in sizes.items()])
+        for collector, values in snapshot["collectors"].items():
+            for key, value in values.items():
+                if isinstance(value, (int, float)):
+                    metric("{}_{}".format(collector, key), "gauge", [({}, value)])
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Function writes the Prometheus dump to a file atomically, e.g. for node_exporter's
+        textfile collector.
+
+        :param path: str
+        :return: None
+        """
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "w") as f:
+            f.write(self.export_prometheus())
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        """
+        Function drops every recorded span, counter and size.
+
+        :return: None
+        """
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+            self._sizes.clear()
+
+
+tracer = Tracer()
+
+
+def traced(name):
+    """
+    Decorator recording every call of a function as a span.
+
+    :param name: str, span name, e.g. "load.load_data"
+    :return: callable
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+# Keyed by id() because figures define __eq__ and are not hashable. Entries are dropped when their
+# object is garbage collected.
+_payload_sizes = {}
+
+
+def payload_size(obj):
+    """
+    Function returns the serialized size of a figure, serializing it at most once per object.
+
+    :param obj: object with a to_json method, e.g. plotly.figure
+    :return: int, bytes
+    """
+    size = _payload_sizes.get(id(obj))
+    if size is None:
+        size = len(obj.to_json())
+        set_payload_size(obj, size)
+
+    return size
+
+
+def set_payload_size(obj, nbytes):
+    """
+    Function records the serialized size of an object whose JSON is already known.
+
+    :param obj: object
+    :param nbytes: int
+    :return: None
+    """
+    if id(obj) not in _payload_sizes:
+        weakref.finalize(obj, _payload_sizes.pop, id(obj), None)
+    _payload_sizes[id(obj)] = nbytes
@@ -0,0 +1,311 @@
+import hashlib
+import re
+import threading
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from src.pages.utils import snapshot_store
+from src.pages.utils.fetcher import get_fetcher
+from src.pages.utils.load_time_series import REFRESH_INTERVAL
+from src.pages.utils.shared_dataset import (attach, attach_array, build_lock, confirm_current, current_version,
+                                            pointer_age, publish, publish_array)
+from src.pages.utils.time_series_cube import daily_deltas
+from src.pages.utils.tracing import traced
+
+US_TIME_SERIES_URL = "{}/csse_covid_19_time_series/time_series_covid19_{}_US.csv"
+US_METRICS = {
+    "Confirmed": "confirmed",
+    "Deaths": "deaths",
+}
+COUNTY_COLUMNS = ["UID", "FIPS", "Admin2", "Province_State", "Lat", "Long_", "Population"]
+SHARED_NAME = "us_counties"
+_VERSION = re.compile(r"us-ts-(\d{4}-\d{2}-\d{2})-(\d{4}-\d{2}-\d{2})-(\d+)(?:-([0-9a-f]+))?$")
+_DATE_COLUMN = re.compile(r"\d{1,2}/\d{1,2}/\d{2}$")
+
+
+def us_time_series_url(metric):
+    """
+    Function returns the source location of a US county time series.
+
+    :param metric: str, one of US_METRICS
+    :return: str
+    """
+    return US_TIME_SERIES_URL.format(snapshot_store.DATA_SOURCE.rstrip("/"), US_METRICS[metric])
+
+
+def us_version(results):
+    """
+    Function derives the data version of the US county series from the header, row count and a
+    digest of the downloaded files, without parsing them. The digest changes the version when
+    upstream corrects values of dates the files already had.
+
+    :param results: dict of metric -> FetchResult
+    :return: str
+    """
+    firsts, lasts, rows = [], [], []
+    digest = hashlib.sha1()
+    for result in results.values():
+        digest.update(result.content)
+        header = result.content[:result.content.index(b"\n")].decode().strip().split(",")
+        dates = pd.to_datetime([column for column in header if _DATE_COLUMN.match(column)], format="%m/%d/%y")
+        firsts.append(dates[0])
+        lasts.append(dates[-1])
+        rows.append(result.content.rstrip(b"\n").count(b"\n"))
+
+    return "us-ts-{}-{}-{}-{}".format(max(firsts).strftime("%Y-%m-%d"), min(lasts).strftime("%Y-%m-%d"), max(rows),
+                                      digest.hexdigest()[:12])
+
+
+def version_dates(version):
+    """
+    Function returns the dates covered by a US county series version.
+
+    :param version: str
+    :return: DatetimeIndex
+    """
+    first, last = _VERSION.match(version).groups()[:2]
+
+    return pd.date_range(first, last, freq="D")
+
+
+def read_us(content, dates):
+    """
+    Function reads one US county time series file onto a daily date range.
+
+    :param content: bytes
+    :param dates: DatetimeIndex
+    :return: (DataFrame, numpy.ndarray of int32 with shape (counties, dates))
+    """
+    df = pd.read_csv(BytesIO(content))
+    date_columns = [column for column in df.columns if _DATE_COLUMN.match(column)]
+    values = df[date_columns].fillna(0).to_numpy(dtype="int32")
+    positions = pd.to_datetime(date_columns, format="%m/%d/%y").get_indexer(dates)
+    # A date missing upstream repeats the previous day rather than dropping to zero.
+    positions = np.maximum.accumulate(positions)
+    counties = df.reindex(columns=COUNTY_COLUMNS)
+
+    return counties, values[:, positions]
+
+
+def build_counties(results, version):
+    """
+    Function aligns the US county files on UID and lays them out for the store: counties sorted by
+    state so every state is one contiguous block of rows, and a (county, date, metric) value array.
+
+    :param results: dict of metric -> FetchResult
+    :param version: str, from us_version
+    :return: (DataFrame, numpy.ndarray)
+    """
+    dates = version_dates(version)
+    parts = {metric: read_us(result.content, dates) for metric, result in results.items()}
+    counties = None
+    for metric_counties, _ in parts.values():
+        if counties is None:
+            counties = metric_counties
+        else:
+            new = ~metric_counties["UID"].isin(counties["UID"])
+            counties = pd.concat([counties, metric_counties[new]], ignore_index=True)
+    population = [metric_counties.set_index("UID")["Population"] for metric_counties, _ in parts.values()]
+    counties["Population"] = pd.concat(population).groupby(level=0).max().reindex(counties["UID"]).to_numpy()
+
+    state = pd.Categorical(counties["Province_State"])
+    order = np.lexsort((counties["Admin2"].fillna("").to_numpy(dtype=str), state.codes))
+    counties = counties.iloc[order].reset_index(drop=True)
+    counties["Province_State"] = pd.Categorical(counties["Province_State"], categories=state.categories)
+    counties["Admin2"] = counties["Admin2"].astype("category")
+    counties["Lat"] = counties["Lat"].astype("float32")
+    counties["Long_"] = counties["Long_"].astype("float32")
+
+    values = np.zeros((len(counties), len(dates), len(parts)), dtype="int32")
+    uid = pd.Index(counties["UID"])
+    for i, (metric_counties, metric_values) in enumerate(parts.values()):
+        values[uid.get_indexer(metric_counties["UID"]), :, i] = metric_values
+
+    return counties, values
+
+
+class CountySeries:
+    """
+    US county time series held as one (county, date, metric) array with a state index.
+    Counties are sorted by state, so a state's series is the sum of one contiguous block of rows
+    and a county's series is a single row.
+    """
+
+    def __init__(self, counties, values, version):
+        self.counties = counties
+        self.values = values
+        self.version = version
+        self.dates = version_dates(version)
+        self.metrics = list(US_METRICS)
+        self._metric_position = {metric: i for i, metric in enumerate(self.metrics)}
+        state = counties["Province_State"]
+        codes = state.cat.codes.to_numpy()
+        positions = np.arange(len(state.cat.categories))
+        starts = np.searchsorted(codes, positions, side="left")
+        stops = np.searchsorted(codes, positions, side="right")
+        self._state_rows = {name: (start, stop) for name, start, stop in zip(state.cat.categories, starts, stops)
+                            if stop > start}
+        self._county_rows = {(name, county): i for i, (name, county) in
+                             enumerate(zip(state.astype(object), counties["Admin2"].astype(object)))
+                             if isinstance(county, str)}
+
+    def states(self):
+        """
+        Function lists the states and territories.
+
+        :return: list of str
+        """
+        return list(self._state_rows)
+
+    def counties_of(self, state):
+        """
+        Function lists the counties of a state.
+
+        :param state: str
+        :return: list of str
+        """
+        start, stop = self._state_rows[state]
+        counties = self.counties["Admin2"].iloc[start:stop].astype(object)
+
+        return [county for county in counties if isinstance(county, str)]
+
+    def series(self, metric, state, county=None):
+        """
+        Function returns the cumulative series of a metric for a state, or one of its counties.
+
+        :param metric: str, one of US_METRICS
+        :param state: str
+        :param county: str
+        :return: numpy.ndarray of shape (len(dates),)
+        """
+        position = self._metric_position[metric]
+        if county is not None:
+            return self.values[self._county_rows[(state, county)], :, position].astype("int64")
+        start, stop = self._state_rows[state]
+
+        return self.values[start:stop, :, position].sum(axis=0, dtype="int64")
+
+    def timeline(self, metric, state, county=None):
+        """
+        Function returns the timeline of a metric in the shape plot_timeline renders.
+
+        :param metric: str
+        :param state: str
+        :param county: str
+        :return: DataFrame with Date, metric and Delta_metric columns
+        """
+        series = self.series(metric, state, county)
+
+        return pd.DataFrame({"Date": self.dates, metric: series, "Delta_{}".format(metric): daily_deltas(series)})
+
+
+def attach_counties(version):
+    """
+    Function attaches to a published version of the US county series.
+
+    :param version: str
+    :return: CountySeries or None
+    """
+    counties, values = attach(SHARED_NAME, version), attach_array(SHARED_NAME, version)
+    if counties is None or values is None:
+        return None
+
+    return CountySeries(counties, values, version)
+
+
+class CountySeriesLoader:
+    """
+    Holds the attached US county series. A version is built once by whichever worker gets to it
+    first and attached from the shared dataset store by every other one, and upstream is
+    revalidated at most every REFRESH_INTERVAL seconds across all workers, in the background, so
+    pages keep serving the last good version while the large files are checked.
+    """
+
+    def __init__(self):
+        self.series = None
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+
+    def _held(self, version):
+        if self.series is not None and self.series.version == version:
+            return self.series
+        return attach_counties(version)
+
+    @traced("load.us_time_series_refresh")
+    def refresh(self):
+        """
+        Function attaches to the current version, first rebuilding it when upstream changed.
+
+        :return: CountySeries
+        """
+        with self._lock, build_lock(SHARED_NAME):
+            version = current_version(SHARED_NAME)
+            series = None
+            if version is not None and pointer_age(SHARED_NAME) <= REFRESH_INTERVAL:
+                series = self._held(version)
+            if series is None:
+                urls = {metric: us_time_series_url(metric) for metric in US_METRICS}
+                results = get_fetcher().fetch_many(list(urls.values()))
+                results = {metric: results[url] for metric, url in urls.items()}
+                new_version = us_version(results)
+                if new_version == version:
+                    confirm_current(SHARED_NAME)
+                    series = self._held(version)
+            if series is None:
+                counties, values = build_counties(results, new_version)
+                publish_array(SHARED_NAME, new_version, values)
+                publish(SHARED_NAME, new_version, counties, current=True)
+                series = attach_counties(new_version)
+            self.series = series
+
+        return series
+
+    def _refresh_in_background(self):
+        if not self._refreshing.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.refresh()
+            except Exception:
+                pass
+            finally:
+                self._refreshing.release()
+
+        threading.Thread(target=run, name="us-time-series-refresh", daemon=True).start()
+
+    def get(self):
+        """
+        Function returns the held series. A version another worker published is attached right
+        away; revalidating upstream happens in the background. Only the very first load, with
+        nothing published yet, blocks on the download.
+
+        :return: CountySeries
+        """
+        series = self.series
+        version = current_version(SHARED_NAME)
+        if version is not None and (series is None or series.version != version):
+            series = attach_counties(version) or series
+            self.series = series
+        if series is None:
+            return self.refresh()
+        if pointer_age(SHARED_NAME) > REFRESH_INTERVAL:
+            self._refresh_in_background()
+
+        return series
+
+
+_LOADER = CountySeriesLoader()
+
+
+@traced("load.us_time_series")
+def load_us_time_series():
+    """
+    Function returns the US county time series, attached from the shared dataset store.
+    Raises FileNotFoundError when the source does not publish US series, and OSError or
+    requests.RequestException when it cannot be reached on the first load.
+
+    :return: CountySeries
+    """
+    return _LOADER.get()
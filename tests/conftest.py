@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.pages.utils import fetcher, shared_dataset, snapshot_store  # noqa: E402
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    """
+    Fixture pointing the data source, the snapshot store and the shared dataset store at empty
+    temporary directories, with a fresh process wide Fetcher.
+
+    :return: pathlib.Path, the data source directory
+    """
+    data = tmp_path / "source"
+    data.mkdir()
+    monkeypatch.setattr(snapshot_store, "DATA_SOURCE", str(data))
+    monkeypatch.setattr(snapshot_store, "STORE_PATH", str(tmp_path / "store"))
+    monkeypatch.setattr(shared_dataset, "SHARED_PATH", str(tmp_path / "shared"))
+    monkeypatch.setattr(fetcher, "_FETCHER", fetcher.Fetcher(max_workers=2))
+
+    return data
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import generate
+from src.pages import dashboard
+from src.pages.utils.chart_payload import _positions, compact_figure, compact_values, lttb
+from src.pages.utils.load_time_series import TimeSeriesRefresher
+
+DAYS = 1000
+MAX_POINTS = 700
+FIRST = pd.Timestamp("2020-01-22")
+LAST = FIRST + pd.Timedelta(days=DAYS - 1)
+
+
+@pytest.fixture
+def timeline(source):
+    """
+    Fixture plotting the worldwide Confirmed timeline of a synthetic series of DAYS dates.
+    """
+    generate(str(source), countries=3, provinces=2, days=DAYS)
+    refresher = TimeSeriesRefresher()
+    refresher.load()
+    fig, _ = dashboard.plot_timeline(refresher.frame, "Confirmed")
+
+    return fig
+
+
+def test_timeline_is_downsampled(timeline):
+    assert all(len(trace.x) == DAYS for trace in timeline.data)
+
+    compact = compact_figure(timeline, MAX_POINTS)
+
+    for trace in compact.data:
+        assert len(trace.x) == len(trace.y) == MAX_POINTS
+        assert (trace.x[0], trace.x[-1]) == (FIRST.strftime("%Y-%m-%d"), LAST.strftime("%Y-%m-%d"))
+
+
+def test_datetime_objects_are_dates():
+    # plotly 4 holds a pandas date column as an object array of datetime objects
+    x = pd.date_range(FIRST, LAST).to_pydatetime().astype(object)
+    y = np.arange(DAYS, dtype="float64")
+
+    kept = lttb(_positions(x), _positions(y), MAX_POINTS)
+
+    assert len(kept) == MAX_POINTS
+    assert compact_values(x[kept]).tolist()[:2] == ["2020-01-22", "2020-01-23"]
+
+
+def test_labels_are_not_dates():
+    labels = np.array(["Tokyo", "Osaka", "Texas"])
+
+    assert compact_values(labels).tolist() == labels.tolist()
+    assert compact_values(labels.astype(object)).tolist() == labels.tolist()
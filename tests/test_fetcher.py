@@ -0,0 +1,141 @@
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from src.pages.utils.fetcher import Fetcher
+
+FILES = {"confirmed.csv": b"Country/Region,1/22/20\nItaly,1\n", "deaths.csv": b"Country/Region,1/22/20\nItaly,0\n",
+         "recovered.csv": b"Country/Region,1/22/20\nItaly,2\n"}
+DELAY = 0.2
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """
+    Serves FILES with ETag and Last-Modified validators and answers matching conditional requests
+    with 304. Every response is delayed so that concurrent requests overlap.
+    """
+    in_flight = 0
+    max_in_flight = 0
+    requests = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            cls.requests.append((self.path, self.headers.get("If-None-Match"),
+                                 self.headers.get("If-Modified-Since")))
+        try:
+            time.sleep(DELAY)
+            content = FILES.get(self.path.lstrip("/"))
+            if content is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", formatdate(0, usegmt=True))
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def do_HEAD(self):
+        self.send_response(200 if self.path.lstrip("/") in FILES else 404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FixtureHandler.in_flight = FixtureHandler.max_in_flight = 0
+    FixtureHandler.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(httpd.server_port)
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_many_is_concurrent(server):
+    fetcher = Fetcher(max_workers=3)
+    urls = ["{}/{}".format(server, name) for name in FILES]
+
+    start = time.perf_counter()
+    results = fetcher.fetch_many(urls)
+    elapsed = time.perf_counter() - start
+
+    assert [results[url].content for url in urls] == list(FILES.values())
+    assert FixtureHandler.max_in_flight == len(FILES)
+    assert elapsed < DELAY * len(FILES)
+
+
+def test_second_fetch_is_conditional(server):
+    fetcher = Fetcher(max_workers=1)
+    url = "{}/confirmed.csv".format(server)
+
+    first = fetcher.fetch(url)
+    second = fetcher.fetch(url)
+
+    assert (first.status, first.modified, first.size) == (200, True, len(FILES["confirmed.csv"]))
+    assert (second.status, second.modified, second.size) == (304, False, 0)
+    assert second.content == FILES["confirmed.csv"]
+    _, etag, modified_since = FixtureHandler.requests[-1]
+    assert etag == '"{}"'.format(hashlib.sha1(FILES["confirmed.csv"]).hexdigest())
+    assert modified_since == formatdate(0, usegmt=True)
+
+
+def test_missing_file_raises_file_not_found(server):
+    fetcher = Fetcher(max_workers=1)
+
+    with pytest.raises(FileNotFoundError):
+        fetcher.fetch("{}/missing.csv".format(server))
+    assert not fetcher.exists("{}/missing.csv".format(server))
+
+
+def test_stats_per_file(server):
+    fetcher = Fetcher(max_workers=1)
+    url = "{}/deaths.csv".format(server)
+    other = "{}/recovered.csv".format(server)
+    fetcher.fetch(url)
+    fetcher.fetch(url)
+    fetcher.fetch(other)
+
+    stats = fetcher.stats()
+
+    assert stats[url]["requests"] == 2
+    assert stats[url]["not_modified"] == 1
+    assert stats[url]["bytes"] == len(FILES["deaths.csv"])
+    assert stats[url]["last_bytes"] == 0
+    assert stats[url]["latency"] >= DELAY
+    assert stats[other]["requests"] == 1
+    assert fetcher.totals()["bytes"] == len(FILES["deaths.csv"]) + len(FILES["recovered.csv"])
+
+
+def test_local_file_is_revalidated_by_mtime(tmp_path):
+    path = tmp_path / "confirmed.csv"
+    path.write_bytes(FILES["confirmed.csv"])
+    fetcher = Fetcher(max_workers=1)
+
+    assert fetcher.fetch(str(path)).modified
+    assert not fetcher.fetch(str(path)).modified
+    path.write_bytes(FILES["confirmed.csv"] + b"Spain,3\n")
+    os.utime(path, (time.time() + 5, time.time() + 5))
+    assert fetcher.fetch(str(path)).content.endswith(b"Spain,3\n")
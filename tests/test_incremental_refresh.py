@@ -0,0 +1,111 @@
+import os
+
+import pandas as pd
+import pytest
+from src.pages.utils import load_time_series, time_series_cube
+from src.pages.utils.data_version import data_version
+from src.pages.utils.fetcher import get_fetcher
+from src.pages.utils.load_time_series import TimeSeriesRefresher, time_series_url
+from src.pages.utils.time_series_cube import get_cube
+
+LOCATIONS = pd.DataFrame({
+    "Province/State": [None, "Hubei", None],
+    "Country/Region": ["Italy", "China", "Spain"],
+    "Lat": [41.9, 30.9, 40.4],
+    "Long": [12.6, 112.2, -3.7],
+})
+DATES = ["1/22/20", "1/23/20", "1/24/20"]
+
+
+def write_series(source, dates):
+    """
+    Function writes the three global time series with the given date columns. Values grow by one
+    per day and differ per metric, so every cell can be checked.
+    """
+    os.makedirs(os.path.dirname(time_series_url("Confirmed")), exist_ok=True)
+    for offset, metric in enumerate(load_time_series.METRICS):
+        frame = LOCATIONS.copy()
+        for day, date in enumerate(dates):
+            frame[date] = (frame.index + 1) * 10 * (offset + 1) + day
+        frame.to_csv(time_series_url(metric), index=False)
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """
+    Fixture recording the date columns every read_wide call parsed.
+    """
+    calls = []
+    read_wide = load_time_series.read_wide
+
+    def recording(source, after=None):
+        result = read_wide(source, after)
+        calls.append(["{}/{}/{:%y}".format(d.month, d.day, d) for d in result[1]])
+        return result
+
+    monkeypatch.setattr(load_time_series, "read_wide", recording)
+
+    return calls
+
+
+@pytest.fixture
+def built(monkeypatch):
+    """
+    Fixture recording the number of rows of every frame a cube is built from.
+    """
+    rows = []
+    build_cube = time_series_cube.build_cube
+
+    def recording(df):
+        rows.append(len(df))
+        return build_cube(df)
+
+    monkeypatch.setattr(time_series_cube, "build_cube", recording)
+
+    return rows
+
+
+def test_refresh_parses_only_the_new_column(source, parsed, built):
+    write_series(source, DATES)
+    refresher = TimeSeriesRefresher()
+    assert refresher.refresh()
+    old_frame = refresher.frame
+    cube = get_cube(old_frame)
+    assert len(cube.dates) == 3
+    parsed.clear()
+    built.clear()
+
+    write_series(source, DATES + ["1/25/20"])
+    assert refresher.refresh()
+
+    assert parsed == [["1/25/20"]] * 3
+    frame = refresher.frame
+    assert len(frame) == len(old_frame) + len(LOCATIONS)
+    pd.testing.assert_frame_equal(frame.iloc[:len(old_frame)].reset_index(drop=True),
+                                  old_frame.reset_index(drop=True), check_categorical=False)
+    tail = frame.iloc[len(old_frame):]
+    assert (tail["Date"] == pd.Timestamp("2020-01-25")).all()
+    assert tail["Confirmed"].tolist() == [13, 23, 33]
+    assert tail["Deaths"].tolist() == [23, 43, 63]
+
+    extended = get_cube(frame)
+    assert built == [len(LOCATIONS)]
+    assert extended.dates[-1] == pd.Timestamp("2020-01-25")
+    assert len(extended.dates) == 4
+    assert extended.series("Confirmed", "Spain")[-1] == 33
+    assert data_version(frame) != data_version(old_frame)
+
+
+def test_unchanged_files_are_not_reread(source, parsed):
+    write_series(source, DATES)
+    refresher = TimeSeriesRefresher()
+    refresher.refresh()
+    frame = refresher.frame
+    parsed.clear()
+    downloaded = get_fetcher().totals()["bytes"]
+
+    assert not refresher.refresh()
+
+    assert parsed == []
+    assert get_fetcher().totals()["bytes"] == downloaded
+    assert refresher.frame is frame